@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the filtered_logger module
+"""
+import re
+import sys
+import time
+import timeit
+
+encrypt_password = __import__('encrypt_password')
+filtered_logger = __import__('filtered_logger')
+
+PII_FIELDS = filtered_logger.PII_FIELDS
+LINE = ("name=Bob Dylan;email=bob@dylan.com;phone=(473) 401-4253;"
+        "ssn=261-72-6780;password=K5?BMNv;ip=60ed:c396:2ff:244::93ea;"
+        "last_login=2019-11-14 06:14:24;user_agent=Mozilla/5.0;")
+
+
+def uncached_filter_datum(fields, redaction, message, separator):
+    """
+    Redact a line the way filter_datum did before the redaction engine,
+    building the pattern from the fields on every call.
+    """
+    return re.sub(r'(?<![^\s{0}])({1})=.*?(?={0}|$)'.format(
+            re.escape(separator), "|".join(map(re.escape, fields))),
+            r'\1=' + redaction, message)
+
+
+def bench_filter_datum(number: int = 100000) -> None:
+    """
+    Print the per-line cost of the uncached and the cached redaction.
+    """
+    uncached = timeit.timeit(lambda: uncached_filter_datum(
+            PII_FIELDS, "***", LINE, ";"), number=number)
+    cached = timeit.timeit(lambda: filtered_logger.filter_datum(
+            PII_FIELDS, "***", LINE, ";"), number=number)
+    print("uncached: {:.2f} us/line".format(uncached / number * 1e6))
+    print("cached:   {:.2f} us/line ({:.1f}x)".format(
+            cached / number * 1e6, uncached / cached))
+
+
+def make_line(n_fields: int, length: int) -> str:
+    """
+    Build a key=value line of about length bytes over n_fields keys.
+    """
+    tokens, size = [], 0
+    while size < length:
+        token = "field{}=value{};".format(len(tokens) % n_fields, len(tokens))
+        tokens.append(token)
+        size += len(token)
+    return "".join(tokens)
+
+
+def bench_modes() -> None:
+    """
+    Print the per-line cost of the regex and split redaction modes for
+    lines of 5, 50 and 500 fields, every other one redacted, from 100 B
+    to 64 KB.
+    """
+    print("{:>6} {:>8} {:>7} {:>12} {:>12}".format(
+            "fields", "redacted", "bytes", "regex (us)", "split (us)"))
+    for n_fields in (5, 50, 500):
+        fields = tuple("field{}".format(i) for i in range(0, n_fields, 2))
+        for length in (100, 1024, 8192, 65536):
+            line = make_line(n_fields, length)
+            timings = []
+            for mode in ("regex", "split"):
+                redact = filtered_logger.compile_redactor(
+                        fields, "***", ";", mode)
+                number, total = timeit.Timer(lambda: redact(line)).autorange()
+                timings.append(total / number * 1e6)
+            print("{:>6} {:>8} {:>7} {:>12.1f} {:>12.1f}".format(
+                    n_fields, len(fields), length, *timings))
+
+
+def bench_bcrypt(low: int = 4, high: int = 14) -> None:
+    """
+    Print the hash and verify time of each bcrypt work factor.
+    """
+    print("{:>6} {:>10} {:>12}".format("rounds", "hash (ms)", "verify (ms)"))
+    for rounds in range(low, high + 1):
+        start = time.perf_counter()
+        hashed = encrypt_password.hash_password("MyAmazingPassw0rd", rounds)
+        hashing = time.perf_counter() - start
+        start = time.perf_counter()
+        encrypt_password.is_valid(hashed, "MyAmazingPassw0rd")
+        verifying = time.perf_counter() - start
+        print("{:>6} {:>10.1f} {:>12.1f}".format(
+                rounds, hashing * 1e3, verifying * 1e3))
+
+
+BENCHMARKS = {
+    "filter_datum": bench_filter_datum,
+    "modes": bench_modes,
+    "bcrypt": bench_bcrypt,
+}
+
+
+if __name__ == "__main__":
+    name = sys.argv[1] if len(sys.argv) > 1 else "filter_datum"
+    BENCHMARKS[name](*map(int, sys.argv[2:]))
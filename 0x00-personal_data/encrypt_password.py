@@ -3,20 +3,33 @@
 Module: encrypt_password
 """
 
+import asyncio
 import bcrypt
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, Tuple
 
 
-def hash_password(password: str) -> bytes:
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+SHARED_WINDOW_FRACTION = 0.5
+SERVICES = {}
+
+
+def hash_password(password: str, rounds: int = None) -> bytes:
     """
     Hash the given password using bcrypt.
 
     Arguments:
     password: str representing the password to be hashed
+    rounds: int representing the bcrypt work factor, BCRYPT_ROUNDS if None
 
     Returns:
     bytes: salted, hashed password
     """
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds or BCRYPT_ROUNDS)
     hashed_password = bcrypt.hashpw(password.encode(), salt)
     return hashed_password
 
@@ -33,3 +46,373 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
     bool: True if the password matches the hashed password, False otherwise
     """
     return bcrypt.checkpw(password.encode(), hashed_password)
+
+
+def hash_rounds(hashed_password: bytes) -> int:
+    """
+    Read the work factor a bcrypt hash was made with.
+
+    Arguments:
+    hashed_password: bytes representing the hashed password, such as
+    b'$2b$12$...'
+
+    Returns:
+    int: bcrypt work factor of the hash
+    """
+    return int(hashed_password.split(b"$")[2])
+
+
+def needs_rehash(hashed_password: bytes, rounds: int = None) -> bool:
+    """
+    Check if a hash was made with a different work factor than the
+    configured one.
+
+    Arguments:
+    hashed_password: bytes representing the hashed password
+    rounds: int representing the expected work factor, BCRYPT_ROUNDS if None
+
+    Returns:
+    bool: True if the password should be hashed again, False otherwise
+    """
+    return hash_rounds(hashed_password) != (rounds or BCRYPT_ROUNDS)
+
+
+def verify_and_upgrade(hashed_password: bytes, password: str,
+                       rounds: int = None) -> Tuple[bool, Optional[bytes]]:
+    """
+    Check a password and hash it again when its hash uses an outdated
+    work factor, so stored hashes follow the configuration on login.
+
+    Arguments:
+    hashed_password: bytes representing the hashed password
+    password: str representing the password to be validated
+    rounds: int representing the expected work factor, BCRYPT_ROUNDS if None
+
+    Returns:
+    tuple: (True, new hash or None if up to date) when the password
+    matches, (False, None) otherwise
+    """
+    if not is_valid(hashed_password, password):
+        return False, None
+    if needs_rehash(hashed_password, rounds):
+        return True, hash_password(password, rounds)
+    return True, None
+
+
+class HashingService:
+    """ Bounded thread pool running bcrypt away from the request workers
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = None,
+                 timeout: float = 10):
+        """
+        Start the thread pool, bcrypt releases the GIL so hashes run in
+        parallel.
+
+        Arguments:
+        workers: int representing the number of threads, one per CPU if None
+        max_pending: int representing the maximum number of hashes queued or
+        running, four per thread if None
+        timeout: float representing the seconds to wait for a free slot
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(self.workers, "bcrypt")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self.pending = 0
+        self.completed = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """
+        Run a function on the pool once a slot is free.
+
+        Arguments:
+        fn: callable to run, such as hash_password or is_valid
+        args: arguments of the callable
+
+        Returns:
+        Future: future resolving to the result of the callable
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise self._saturated()
+        return self._start(fn, *args)
+
+    def _start(self, fn: Callable, *args) -> Future:
+        """
+        Run a function on the pool, its slot being already acquired.
+
+        Arguments:
+        fn: callable to run
+        args: arguments of the callable
+
+        Returns:
+        Future: future resolving to the result of the callable
+        """
+        with self._lock:
+            self.pending += 1
+        start = time.perf_counter()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._done(start)
+            raise
+        future.add_done_callback(lambda _: self._done(start))
+        return future
+
+    def hash(self, password: str, rounds: int = None) -> bytes:
+        """
+        Hash a password on the pool and wait for the result.
+
+        Arguments:
+        password: str representing the password to be hashed
+        rounds: int representing the bcrypt work factor, BCRYPT_ROUNDS if None
+
+        Returns:
+        bytes: salted, hashed password
+        """
+        return self.submit(hash_password, password, rounds).result()
+
+    def verify(self, hashed_password: bytes, password: str) -> bool:
+        """
+        Check a password on the pool and wait for the result.
+
+        Arguments:
+        hashed_password: bytes representing the hashed password
+        password: str representing the password to be validated
+
+        Returns:
+        bool: True if the password matches the hashed password
+        """
+        return self.submit(is_valid, hashed_password, password).result()
+
+    async def hash_async(self, password: str, rounds: int = None) -> bytes:
+        """
+        Hash a password on the pool without blocking the event loop.
+
+        Arguments:
+        password: str representing the password to be hashed
+        rounds: int representing the bcrypt work factor, BCRYPT_ROUNDS if None
+
+        Returns:
+        bytes: salted, hashed password
+        """
+        return await self._submit_async(hash_password, password, rounds)
+
+    async def verify_async(self, hashed_password: bytes,
+                           password: str) -> bool:
+        """
+        Check a password on the pool without blocking the event loop.
+
+        Arguments:
+        hashed_password: bytes representing the hashed password
+        password: str representing the password to be validated
+
+        Returns:
+        bool: True if the password matches the hashed password
+        """
+        return await self._submit_async(is_valid, hashed_password, password)
+
+    def metrics(self) -> dict:
+        """
+        Report the queue depth and the latency of completed calls.
+
+        Returns:
+        dict: pending, completed, avg_latency_ms and max_latency_ms
+        """
+        with self._lock:
+            average = self.total_latency / self.completed \
+                if self.completed else 0.0
+            return {
+                "pending": self.pending,
+                "completed": self.completed,
+                "avg_latency_ms": average * 1e3,
+                "max_latency_ms": self.max_latency * 1e3,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the thread pool.
+
+        Arguments:
+        wait: True to wait for the pending calls to finish
+        """
+        self._executor.shutdown(wait)
+
+    async def _submit_async(self, fn: Callable, *args):
+        """
+        Submit a call once a slot is free, waiting for it on the event loop.
+
+        The slot is taken without blocking; when none is free the coroutine
+        waits for _done() to wake it, so no thread is tied up waiting and
+        only the call itself runs on the pool.
+
+        Arguments:
+        fn: callable to run
+        args: arguments of the callable
+
+        Returns:
+        result of the callable
+        """
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.timeout
+        while not self._slots.acquire(blocking=False):
+            waiter = loop.create_future()
+            with self._lock:
+                self._waiters.append((loop, waiter))
+            if self._slots.acquire(blocking=False):
+                self._forget(loop, waiter)
+                break
+            try:
+                await asyncio.wait_for(waiter, deadline - loop.time())
+            except asyncio.TimeoutError:
+                self._forget(loop, waiter)
+                raise self._saturated() from None
+            except asyncio.CancelledError:
+                self._forget(loop, waiter)
+                raise
+        future = self._start(fn, *args)
+        return await asyncio.wrap_future(future)
+
+    def _forget(self, loop: asyncio.AbstractEventLoop,
+                waiter: asyncio.Future) -> None:
+        """
+        Withdraw a coroutine from the waiters once it stops waiting, passing
+        its wake-up on to the next one if _done() already picked it.
+
+        Arguments:
+        loop: event loop of the coroutine
+        waiter: asyncio.Future the coroutine awaited
+        """
+        with self._lock:
+            try:
+                self._waiters.remove((loop, waiter))
+                return
+            except ValueError:
+                pass
+        self._wake_one()
+
+    def _saturated(self) -> TimeoutError:
+        """
+        Build the error raised when no slot frees up in time.
+
+        Returns:
+        TimeoutError: error naming the number of pending calls
+        """
+        return TimeoutError("Hashing service saturated: {} pending".format(
+                self.max_pending))
+
+    def _wake_one(self) -> None:
+        """
+        Wake the oldest coroutine still waiting for a slot, if any.
+        """
+        with self._lock:
+            while self._waiters:
+                loop, waiter = self._waiters.popleft()
+                if not waiter.done():
+                    break
+            else:
+                return
+        try:
+            loop.call_soon_threadsafe(_resolve, waiter)
+        except RuntimeError:
+            pass
+
+    def _done(self, start: float) -> None:
+        """
+        Record the end of a call and free its slot.
+
+        Arguments:
+        start: float representing the perf_counter() value at submission
+        """
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+        self._slots.release()
+        self._wake_one()
+
+
+def _resolve(waiter: asyncio.Future) -> None:
+    """
+    Wake a coroutine waiting for a slot, unless it already gave up.
+
+    Arguments:
+    waiter: asyncio.Future the coroutine awaits
+    """
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def get_hashing_service() -> HashingService:
+    """
+    Get the shared hashing service, sized by BCRYPT_WORKERS and
+    BCRYPT_MAX_PENDING.
+
+    Returns:
+    HashingService: shared hashing service
+    """
+    if "default" not in SERVICES:
+        SERVICES["default"] = HashingService(
+            workers=int(os.getenv("BCRYPT_WORKERS", "0")) or None,
+            max_pending=int(os.getenv("BCRYPT_MAX_PENDING", "0")) or None
+        )
+    return SERVICES["default"]
+
+
+def hash_passwords(passwords: Iterable[str], rounds: int = None,
+                   service: HashingService = None,
+                   progress: Callable[[int], None] = None,
+                   window: int = None) -> Iterator[bytes]:
+    """
+    Hash many passwords in parallel, yielding the hashes in input order.
+
+    At most window passwords are in flight at once, so memory stays
+    bounded whatever the size of the input. Without a service the batch
+    runs on a pool of its own, shut down once it is done, so it never
+    takes the slots of the logins using the shared service.
+
+    Arguments:
+    passwords: iterable of str representing the passwords to be hashed
+    rounds: int representing the bcrypt work factor, BCRYPT_ROUNDS if None
+    service: HashingService running the hashes, a dedicated one if None
+    progress: callable receiving the number of hashes yielded so far
+    window: int representing the maximum number of hashes in flight, the
+    max_pending of a dedicated service if None, SHARED_WINDOW_FRACTION of
+    it for a given service
+
+    Returns:
+    iterator: salted, hashed password for each input password
+    """
+    dedicated = service is None
+    if dedicated:
+        service = HashingService()
+        window = window or service.max_pending
+    else:
+        window = window or max(
+            1, int(service.max_pending * SHARED_WINDOW_FRACTION))
+    in_flight = deque()
+    count = 0
+    passwords = iter(passwords)
+    try:
+        while True:
+            for password in passwords:
+                in_flight.append(
+                    service.submit(hash_password, password, rounds))
+                if len(in_flight) >= window:
+                    break
+            if not in_flight:
+                return
+            yield in_flight.popleft().result()
+            count += 1
+            if progress is not None:
+                progress(count)
+    finally:
+        if dedicated:
+            service.shutdown()
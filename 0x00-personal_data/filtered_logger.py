@@ -7,9 +7,22 @@ import csv
 import logging
 import os
 import mysql.connector
+import queue
 import re
-from logging import Logger, StreamHandler
-from logging.handlers import RotatingFileHandler
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from logging import Handler, Logger, StreamHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Callable, FrozenSet, Iterator, List, Tuple
+
+
+REDACTOR_CACHE_SIZE = 128
+QUEUE_SIZE = 10000
+BATCH_SIZE = 1000
+LOGGER_STATE = {}
+POOLS = {}
 
 
 class RedactingFormatter(logging.Formatter):
@@ -20,9 +33,12 @@ class RedactingFormatter(logging.Formatter):
     FORMAT = "[HOLBERTON] %(name)s %(levelname)s %(asctime)-15s: %(message)s"
     SEPARATOR = ";"
 
-    def __init__(self, fields):
+    def __init__(self, fields: List[str], mode: str = "regex"):
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        self.mode = mode
+        self._redact = compile_redactor(
+                tuple(fields), self.REDACTION, self.SEPARATOR, mode)
 
     def format(self, record: logging.LogRecord) -> str:
         """
@@ -34,12 +50,77 @@ class RedactingFormatter(logging.Formatter):
         Returns:
         str: formatted log message with specified fields redacted
         """
-        message = super().format(record)
-        return filter_datum(
-                self.fields, self.REDACTION, message, self.SEPARATOR)
+        return self._redact(super().format(record))
+
+
+@lru_cache(maxsize=REDACTOR_CACHE_SIZE)
+def compile_redactor(fields: Tuple[str, ...], redaction: str,
+                     separator: str,
+                     mode: str = "regex") -> Callable[[str], str]:
+    """
+    Build the redaction function for one combination of arguments.
+
+    The redactor is built once per (fields, redaction, separator, mode) and
+    kept in a bounded LRU cache, least recently used combinations are
+    evicted first.
+
+    Arguments:
+    fields: tuple of strings representing fields to obfuscate
+    redaction: string representing the redaction to replace the fields with
+    separator: string representing the character separating fields in the log
+    line
+    mode: "regex" to substitute with a compiled regex, "split" to tokenize
+    the line once on the separator
+
+    Returns:
+    callable: function taking a log line and returning it obfuscated
+    """
+    if mode not in ("regex", "split"):
+        raise ValueError("Unknown redaction mode: {}".format(mode))
+    if not fields:
+        return str
+    if mode == "split":
+        return partial(split_redact, frozenset(fields), redaction, separator)
+    pattern = re.compile(r'(?<![^\s{0}])({1})=.*?(?={0}|$)'.format(
+            re.escape(separator), "|".join(map(re.escape, fields))))
+    return partial(pattern.sub, r'\1=' + redaction.replace('\\', r'\\'))
 
 
-def filter_datum(fields, redaction, message, separator):
+def split_redact(fields: FrozenSet[str], redaction: str, separator: str,
+                 message: str) -> str:
+    """
+    Redact a key=value log line in a single pass without regex.
+
+    The line is split once on the separator. In each segment, the first
+    "key=" whose key is a word of the fields set, starting the segment or
+    following whitespace, has the rest of the segment replaced, as the
+    regex mode does, and the line is joined back together.
+
+    Arguments:
+    fields: frozenset of strings representing fields to obfuscate
+    redaction: string representing the redaction to replace the fields with
+    separator: string representing the character separating fields in the log
+    line
+    message: string representing the log line
+
+    Returns:
+    string: log message with specified fields obfuscated
+    """
+    tokens = message.split(separator)
+    for i, token in enumerate(tokens):
+        equal = token.find("=")
+        while equal >= 0:
+            key = token[:equal]
+            if key and not key[-1].isspace() and \
+                    key.rsplit(None, 1)[-1] in fields:
+                tokens[i] = token[:equal + 1] + redaction
+                break
+            equal = token.find("=", equal + 1)
+    return separator.join(tokens)
+
+
+def filter_datum(fields: List[str], redaction: str, message: str,
+                 separator: str) -> str:
     """
     Replace certain fields in a log message with a specified redaction.
 
@@ -53,24 +134,144 @@ def filter_datum(fields, redaction, message, separator):
     Returns:
     string: log message with specified fields obfuscated
     """
-    return re.sub(fr'(?<= {separator} | ^)({" | ".join(fields)}=).*?({
-            separator} | $)', fr'\1{redaction}\2', message)
+    return compile_redactor(tuple(fields), redaction, separator)(message)
+
+
+class BlockingQueueListener(QueueListener):
+    """ Queue listener whose stop sentinel waits for room in a full queue
+    """
 
+    def enqueue_sentinel(self) -> None:
+        """
+        Put the stop sentinel on the queue, blocking until there is room so
+        that every record already queued is handled before stopping.
+        """
+        self.queue.put(self._sentinel)
 
-def get_logger() -> Logger:
+
+class AsyncHandler(QueueHandler):
+    """ Handler moving formatting, redaction and I/O to a background thread
+    """
+
+    def __init__(self, handler: Handler, maxsize: int = QUEUE_SIZE,
+                 block: bool = False):
+        """
+        Start a listener thread feeding the given handler from a bounded
+        queue.
+
+        Arguments:
+        handler: logging.Handler doing the actual formatting and writing
+        maxsize: maximum number of records waiting in the queue
+        block: True to block the caller when the queue is full, False to
+        drop the record
+        """
+        super(AsyncHandler, self).__init__(queue.Queue(maxsize))
+        self.block = block
+        self.queued = 0
+        self.dropped = 0
+        self.listener = BlockingQueueListener(
+                self.queue, handler, respect_handler_level=True)
+        self.listener.start()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Merge the message arguments without formatting the record, the
+        formatter runs on the listener thread.
+
+        Arguments:
+        record: logging.LogRecord object representing the log record
+
+        Returns:
+        logging.LogRecord: record ready to be queued
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """
+        Queue a record, blocking or dropping it when the queue is full.
+
+        Arguments:
+        record: logging.LogRecord object representing the log record
+        """
+        try:
+            self.queue.put(record, block=self.block)
+        except queue.Full:
+            self.dropped += 1
+        else:
+            self.queued += 1
+
+    def close(self) -> None:
+        """
+        Stop the listener once every queued record has been handled.
+        """
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        super(AsyncHandler, self).close()
+
+
+def get_logger(queued: bool = False, maxsize: int = QUEUE_SIZE,
+               block: bool = False) -> Logger:
     """
     Get a configured logger object.
 
+    Calling it again with the same arguments returns the logger untouched,
+    calling it with different arguments rebuilds its single handler around
+    the current target.
+
+    Arguments:
+    queued: True to format and write records on a background thread
+    maxsize: maximum number of records waiting when queued
+    block: True to block the caller when the queue is full, False to drop
+    the record
+
     Returns:
     logging.Logger: configured logger object
     """
     logger = logging.getLogger("user_data")
+    config = (queued, maxsize, block)
+    state = LOGGER_STATE.setdefault(logger.name, {})
+    if state.get("config") == config:
+        return logger
     logger.setLevel(logging.INFO)
     logger.propagate = False
-    formatter = RedactingFormatter(fields=PII_FIELDS)
-    stream_handler = StreamHandler()
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
+    state["config"] = config
+    return set_log_target(state.get("target") or StreamHandler())
+
+
+def set_log_target(target: Handler) -> Logger:
+    """
+    Make the user_data logger write to a new target, such as a
+    StreamHandler or a RotatingFileHandler.
+
+    The handler is swapped in a single assignment so no record is written
+    twice or lost, then the previous handler is flushed and closed.
+
+    Arguments:
+    target: logging.Handler writing the redacted records
+
+    Returns:
+    logging.Logger: configured logger object
+    """
+    logger = logging.getLogger("user_data")
+    state = LOGGER_STATE.get(logger.name)
+    if state is None or "config" not in state:
+        get_logger()
+        state = LOGGER_STATE[logger.name]
+    queued, maxsize, block = state["config"]
+    if "formatter" not in state:
+        state["formatter"] = RedactingFormatter(fields=PII_FIELDS)
+    target.setFormatter(state["formatter"])
+    handler = AsyncHandler(target, maxsize, block) if queued else target
+    previous, state["target"] = state.get("target"), target
+    old_handlers, logger.handlers = logger.handlers, [handler]
+    for old_handler in old_handlers:
+        if old_handler is not target:
+            old_handler.close()
+    if previous is not None and previous is not target:
+        previous.close()
     return logger
 
 
@@ -94,23 +295,178 @@ def get_db():
     )
 
 
-def main():
+class ConnectionPool:
+    """ Bounded pool of reusable database connections
+    """
+
+    def __init__(self, connect: Callable = None, size: int = 5,
+                 timeout: float = 30, recycle: float = 3600):
+        """
+        Create an empty pool, connections are opened on demand.
+
+        Arguments:
+        connect: callable opening a new connection, get_db by default
+        size: int representing the maximum number of open connections
+        timeout: float representing the seconds to wait for a free
+        connection
+        recycle: float representing the seconds after which a connection
+        is closed and replaced
+        """
+        self.connect = connect or get_db
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._opened_at = {}
+
+    def acquire(self):
+        """
+        Check out a healthy connection, opening one if none is idle.
+
+        Idle connections that are too old or fail is_connected() are
+        closed and skipped.
+
+        Returns:
+        connection: database connection to give back with release()
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("No database connection available after "
+                               "{}s".format(self.timeout))
+        try:
+            while True:
+                try:
+                    db = self._idle.get_nowait()
+                except queue.Empty:
+                    db = self.connect()
+                    self._opened_at[id(db)] = time.monotonic()
+                    return db
+                age = time.monotonic() - self._opened_at[id(db)]
+                if age < self.recycle and db.is_connected():
+                    return db
+                self._discard(db)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, db) -> None:
+        """
+        Give a connection back to the pool, ending its transaction.
+
+        Arguments:
+        db: connection previously returned by acquire()
+        """
+        try:
+            db.rollback()
+        except Exception:
+            self._discard(db)
+        else:
+            self._idle.put(db)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager checking out a connection and releasing it on exit.
+
+        Returns:
+        connection: database connection
+        """
+        db = self.acquire()
+        try:
+            yield db
+        finally:
+            self.release(db)
+
+    def close(self) -> None:
+        """
+        Close every idle connection.
+        """
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def _discard(self, db) -> None:
+        """
+        Close a connection and forget it.
+
+        Arguments:
+        db: connection to close
+        """
+        self._opened_at.pop(id(db), None)
+        try:
+            db.close()
+        except Exception:
+            pass
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Get the shared connection pool for the PERSONAL_DATA_DB_* database.
+
+    The pool is sized by PERSONAL_DATA_DB_POOL_SIZE (default 5), waits
+    PERSONAL_DATA_DB_POOL_TIMEOUT seconds for a free connection (default
+    30) and recycles connections after PERSONAL_DATA_DB_POOL_RECYCLE
+    seconds (default 3600).
+
+    Returns:
+    ConnectionPool: shared connection pool
+    """
+    if "default" not in POOLS:
+        POOLS["default"] = ConnectionPool(
+            size=int(os.getenv("PERSONAL_DATA_DB_POOL_SIZE", "5")),
+            timeout=float(os.getenv("PERSONAL_DATA_DB_POOL_TIMEOUT", "30")),
+            recycle=float(os.getenv("PERSONAL_DATA_DB_POOL_RECYCLE", "3600"))
+        )
+    return POOLS["default"]
+
+
+def stream_rows(cursor, batch_size: int = BATCH_SIZE) -> Iterator[str]:
+    """
+    Stream the rows of an executed query as key=value log lines.
+
+    Rows are fetched batch_size at a time so only one batch is held in
+    memory, whatever the size of the result.
+
+    Arguments:
+    cursor: executed database cursor
+    batch_size: int representing the number of rows fetched at once
+
+    Returns:
+    iterator: "name=...; email=...;" line for each row
+    """
+    template = "; ".join(
+            "{}={{}}".format(column) for column in cursor.column_names) + ";"
+    rows = cursor.fetchmany(batch_size)
+    while rows:
+        for row in rows:
+            yield template.format(*row)
+        rows = cursor.fetchmany(batch_size)
+
+
+def main(batch_size: int = BATCH_SIZE):
     """
     Retrieve all rows in the users table and display each row under a
     filtered format.
+
+    Arguments:
+    batch_size: int representing the number of rows fetched at once
     """
     logger = get_logger()
-    db = get_db()
-    cursor = db.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users;")
-    for row in cursor:
-        filtered_row = {
-                key: "****" if key in PII_FIELDS else value for key,
-                value in row.items()
-                }
-        logger.info(filtered_row)
-    cursor.close()
-    db.close()
+    with get_pool().connection() as db:
+        cursor = db.cursor(buffered=False)
+        cursor.execute("SELECT * FROM users;")
+        start, count = time.perf_counter(), 0
+        for line in stream_rows(cursor, batch_size):
+            logger.info(line)
+            count += 1
+        elapsed = time.perf_counter() - start
+        cursor.close()
+    logger.info("exported %d rows in %.2fs (%.0f rows/s)",
+                count, elapsed, count / elapsed if elapsed else 0)
 
 
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Module: redact_logs
+
+Re-redact a log file in parallel:
+    ./redact_logs.py app.log -o app.redacted.log -f name,email,ssn -j 8
+"""
+
+import argparse
+import mmap
+import os
+import sys
+import time
+from multiprocessing import Pool
+from typing import List, Tuple
+
+from filtered_logger import PII_FIELDS, RedactingFormatter, compile_redactor
+
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def chunk_bounds(path: str,
+                 chunk_size: int = CHUNK_SIZE) -> List[Tuple[int, int]]:
+    """
+    Split a file into chunks of about chunk_size bytes ending on a newline.
+
+    Arguments:
+    path: string representing the file to split
+    chunk_size: int representing the target size of a chunk in bytes
+
+    Returns:
+    list: (start, end) byte offsets of each chunk
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    bounds = []
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = 0
+            while start < size:
+                end = data.find(b"\n", min(start + chunk_size, size) - 1)
+                end = size if end == -1 else end + 1
+                bounds.append((start, end))
+                start = end
+    return bounds
+
+
+def redact_chunk(task: tuple) -> bytes:
+    """
+    Redact every line of one chunk of a file.
+
+    Arguments:
+    task: tuple (path, start, end, fields, redaction, separator, mode)
+
+    Returns:
+    bytes: redacted chunk
+    """
+    path, start, end, fields, redaction, separator, mode = task
+    redact = compile_redactor(fields, redaction, separator, mode)
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            text = data[start:end].decode("utf-8", "surrogateescape")
+    lines = [redact(line) for line in text.split("\n")]
+    return "\n".join(lines).encode("utf-8", "surrogateescape")
+
+
+def redact_file(path: str, output, fields: Tuple[str, ...],
+                redaction: str = RedactingFormatter.REDACTION,
+                separator: str = RedactingFormatter.SEPARATOR,
+                mode: str = "regex", workers: int = None,
+                chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Redact a log file across a process pool, writing chunks in order.
+
+    Arguments:
+    path: string representing the log file to redact
+    output: binary file object receiving the redacted log
+    fields: tuple of strings representing fields to obfuscate
+    redaction: string representing the redaction to replace the fields with
+    separator: string representing the character separating fields
+    mode: redaction mode, "regex" or "split"
+    workers: int representing the number of processes, one per CPU if None
+    chunk_size: int representing the target size of a chunk in bytes
+
+    Returns:
+    int: number of bytes read
+    """
+    tasks = [(path, start, end, fields, redaction, separator, mode)
+             for start, end in chunk_bounds(path, chunk_size)]
+    with Pool(workers) as pool:
+        for chunk in pool.imap(redact_chunk, tasks):
+            output.write(chunk)
+    return tasks[-1][2] if tasks else 0
+
+
+def main() -> None:
+    """
+    Parse the command line, redact the file and report the throughput.
+    """
+    parser = argparse.ArgumentParser(
+            description="Re-redact a log file in parallel")
+    parser.add_argument("path", help="log file to redact")
+    parser.add_argument("-o", "--output", help="output file (default stdout)")
+    parser.add_argument("-f", "--fields", default=",".join(PII_FIELDS),
+                        help="comma separated fields to redact")
+    parser.add_argument("-r", "--redaction",
+                        default=RedactingFormatter.REDACTION)
+    parser.add_argument("-s", "--separator",
+                        default=RedactingFormatter.SEPARATOR)
+    parser.add_argument("-m", "--mode", choices=("regex", "split"),
+                        default="regex")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of processes (default one per CPU)")
+    parser.add_argument("-c", "--chunk-size", type=int,
+                        default=CHUNK_SIZE // (1024 * 1024),
+                        help="chunk size in MB")
+    args = parser.parse_args()
+
+    fields = tuple(field for field in args.fields.split(",") if field)
+    start = time.perf_counter()
+    if args.output:
+        with open(args.output, "wb") as output:
+            size = redact_file(args.path, output, fields, args.redaction,
+                               args.separator, args.mode, args.workers,
+                               args.chunk_size * 1024 * 1024)
+    else:
+        size = redact_file(args.path, sys.stdout.buffer, fields,
+                           args.redaction, args.separator, args.mode,
+                           args.workers, args.chunk_size * 1024 * 1024)
+    elapsed = time.perf_counter() - start
+    print("redacted {:.1f} MB in {:.2f}s ({:.1f} MB/s)".format(
+            size / 1e6, elapsed, size / 1e6 / elapsed if elapsed else 0),
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
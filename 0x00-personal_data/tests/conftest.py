@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+""" Fixtures of the tests
+"""
+import pytest
+
+
+class FakeClock():
+    """ Clock standing in for the time module, moved by hand
+    """
+
+    def __init__(self, now: float = 0.0):
+        """ Initialize the clock at now
+        """
+        self.now = now
+
+    def time(self) -> float:
+        """ Return the current fake time
+        """
+        return self.now
+
+    def monotonic(self) -> float:
+        """ Return the current fake time
+        """
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    """ A fake clock at 0, to patch over the time module of a module
+    """
+    return FakeClock()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+""" Tests of the ConnectionPool of the filtered_logger module
+"""
+import pytest
+import filtered_logger
+from filtered_logger import ConnectionPool
+
+
+class FakeConnection:
+    """ Connection recording what the pool does with it
+    """
+
+    def __init__(self):
+        """ Initialize an open connection
+        """
+        self.connected = True
+        self.closed = False
+        self.rollbacks = 0
+        self.fail_rollback = False
+
+    def is_connected(self) -> bool:
+        """ Return True until the connection is dropped
+        """
+        return self.connected
+
+    def rollback(self) -> None:
+        """ Count the rollbacks, failing if asked to
+        """
+        if self.fail_rollback:
+            raise OSError("Lost connection")
+        self.rollbacks += 1
+
+    def close(self) -> None:
+        """ Close the connection
+        """
+        self.closed = True
+        self.connected = False
+
+
+@pytest.fixture
+def opened():
+    """ List of the connections opened by the fake connector
+    """
+    return []
+
+
+@pytest.fixture
+def pool(opened):
+    """ Pool of two fake connections
+    """
+    def connect() -> FakeConnection:
+        """ Open a fake connection
+        """
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    pool = ConnectionPool(connect, size=2, timeout=0.05, recycle=60)
+    yield pool
+    pool.close()
+
+
+def test_reuses_released_connection(pool, opened):
+    """ A released connection is checked out again instead of a new one
+    """
+    with pool.connection() as db:
+        pass
+    with pool.connection() as again:
+        assert again is db
+    assert len(opened) == 1
+
+
+def test_release_rolls_back(pool, opened):
+    """ Releasing ends the transaction, a failed rollback drops the
+    connection
+    """
+    db = pool.acquire()
+    pool.release(db)
+    assert db.rollbacks == 1 and not db.closed
+    db = pool.acquire()
+    db.fail_rollback = True
+    pool.release(db)
+    assert db.closed
+    assert pool.acquire() is not db
+    assert len(opened) == 2
+
+
+def test_replaces_dropped_connection(pool, opened):
+    """ An idle connection failing is_connected() is replaced on checkout
+    """
+    with pool.connection() as db:
+        pass
+    db.connected = False
+    with pool.connection() as again:
+        assert again is not db
+    assert db.closed
+    assert len(opened) == 2
+
+
+def test_recycles_old_connection(pool, opened, clock, monkeypatch):
+    """ An idle connection older than recycle is replaced on checkout
+    """
+    monkeypatch.setattr(filtered_logger, "time", clock)
+    with pool.connection() as db:
+        pass
+    clock.now = 59
+    with pool.connection() as again:
+        assert again is db
+    clock.now = 60
+    with pool.connection() as again:
+        assert again is not db
+    assert db.closed
+
+
+def test_times_out_when_exhausted(pool, opened):
+    """ Checking out more than size connections times out, releasing one
+    frees a slot
+    """
+    first, second = pool.acquire(), pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+    assert len(opened) == 2
+
+
+def test_connect_failure_frees_slot(opened):
+    """ A connector raising does not leak a slot
+    """
+    def connect():
+        """ Fail to connect
+        """
+        raise OSError("Connection refused")
+
+    pool = ConnectionPool(connect, size=1, timeout=0.05)
+    for i in range(3):
+        with pytest.raises(OSError):
+            pool.acquire()
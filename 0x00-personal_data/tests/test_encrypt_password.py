@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+""" Tests of the encrypt_password module
+"""
+import asyncio
+import pytest
+import threading
+import time
+import encrypt_password
+from concurrent.futures import ThreadPoolExecutor
+from encrypt_password import HashingService, hash_passwords, is_valid
+
+
+def test_batch_leaves_shared_service_alone(monkeypatch):
+    """ Without a service, a batch never takes a slot of the shared one
+    """
+    shared = HashingService(workers=2, max_pending=4)
+    monkeypatch.setattr(encrypt_password, "SERVICES", {"default": shared})
+    passwords = ["pwd{}".format(i) for i in range(8)]
+    seen = []
+    hashes = list(hash_passwords(
+        passwords, 4, progress=lambda count: seen.append(shared.pending)))
+    assert all(map(is_valid, hashes, passwords))
+    assert seen == [0] * 8 and shared.completed == 0
+    shared.shutdown()
+
+
+def test_batch_keeps_slots_free_on_given_service():
+    """ On a given service a batch keeps at most a fraction of its slots
+    """
+    service = HashingService(workers=2, max_pending=4)
+    passwords = ["pwd{}".format(i) for i in range(8)]
+    seen = []
+    hashes = list(hash_passwords(
+        passwords, 4, service, lambda count: seen.append(service.pending)))
+    assert all(map(is_valid, hashes, passwords))
+    assert max(seen) <= 2
+    service.shutdown()
+
+
+class NoExecutor(ThreadPoolExecutor):
+    """ Default executor failing any call handed to it
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        """ Refuse the call
+        """
+        raise AssertionError("default executor used")
+
+
+def test_async_calls_wait_for_slots_on_the_loop():
+    """ Async callers beyond max_pending wait on the event loop, not on
+    threads of the default executor
+    """
+    service = HashingService(workers=2, max_pending=2)
+    passwords = ["pwd{}".format(i) for i in range(12)]
+
+    async def run():
+        """ Hash every password at once
+        """
+        asyncio.get_event_loop().set_default_executor(NoExecutor(1))
+        return await asyncio.gather(*(
+            service.hash_async(password, 4) for password in passwords))
+
+    loop = asyncio.new_event_loop()
+    try:
+        hashes = loop.run_until_complete(run())
+    finally:
+        loop.close()
+    assert all(map(is_valid, hashes, passwords))
+    assert service.metrics()["completed"] == 12
+    assert service.pending == 0
+    service.shutdown()
+
+
+def test_async_call_times_out_when_saturated():
+    """ An async caller gives up after timeout when no slot frees up
+    """
+    service = HashingService(workers=1, max_pending=1, timeout=0.05)
+    release = threading.Event()
+    busy = service.submit(release.wait)
+    loop = asyncio.new_event_loop()
+    try:
+        with pytest.raises(TimeoutError):
+            loop.run_until_complete(service.hash_async("pwd", 4))
+    finally:
+        loop.close()
+        release.set()
+    busy.result()
+    assert service.hash("pwd", 4)
+    service.shutdown()
+
+
+class RacingSlots:
+    """ Slots freeing one up, as a pool thread would, right before the
+    coroutine retries its acquire after registering as a waiter
+    """
+
+    def __init__(self, slots, free_one):
+        """ Wrap the slots of a service
+        """
+        self.slots = slots
+        self.free_one = free_one
+        self.calls = 0
+
+    def acquire(self, blocking: bool = True, timeout: float = None) -> bool:
+        """ Acquire a slot, freeing one first on the second call
+        """
+        self.calls += 1
+        if self.calls == 2:
+            self.free_one()
+        return self.slots.acquire(blocking, timeout)
+
+    def release(self) -> None:
+        """ Release a slot
+        """
+        self.slots.release()
+
+
+def test_async_waiter_woken_while_it_retries():
+    """ A coroutine woken between registering and retrying its acquire
+    takes the slot without failing and leaves no waiter behind
+    """
+    service = HashingService(workers=1, max_pending=1)
+    release = threading.Event()
+    busy = service.submit(release.wait)
+
+    def free_one():
+        """ Finish the busy call and wait for its slot to be freed
+        """
+        release.set()
+        busy.result()
+        while service.pending:
+            time.sleep(0.001)
+
+    service._slots = RacingSlots(service._slots, free_one)
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(service._submit_async(abs, -1)) == 1
+    finally:
+        loop.close()
+    assert len(service._waiters) == 0
+    service.shutdown()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+""" Tests of the filtered_logger module
+"""
+import io
+import logging
+import pytest
+import filtered_logger
+from filtered_logger import (PII_FIELDS, compile_redactor, get_logger,
+                             set_log_target)
+
+
+@pytest.mark.parametrize("message", [
+    "user=1;\tpassword=secret;",
+    "hdr\npassword=secret;",
+    "name=Bob; email=bob@dylan.com; ip=1.2.3.4;",
+    "password =secret;=x; email=;",
+    "x.password=secret; last_login=2019;",
+    "x=1 name=bob; y=2 z=3\temail=a@b.c;",
+    "a=name=bob; ssn =1 ssn=2;",
+])
+def test_split_mode_matches_regex_mode(message):
+    """ Both redaction modes give the same line
+    """
+    regex = compile_redactor(PII_FIELDS, "***", ";", "regex")
+    split = compile_redactor(PII_FIELDS, "***", ";", "split")
+    assert split(message) == regex(message)
+
+
+@pytest.fixture
+def fresh_logger(monkeypatch):
+    """ Reset the user_data logger before and after a test
+    """
+    logger = logging.getLogger("user_data")
+    monkeypatch.setattr(filtered_logger, "LOGGER_STATE", {})
+    monkeypatch.setattr(logger, "handlers", [])
+    yield logger
+    for handler in logger.handlers:
+        handler.close()
+
+
+@pytest.mark.parametrize("queued", [False, True])
+def test_one_redacted_line_per_message(fresh_logger, queued):
+    """ Reconfiguring the logger never duplicates nor loses a line
+    """
+    first, second = io.StringIO(), io.StringIO()
+    logger = get_logger(queued=queued)
+    set_log_target(logging.StreamHandler(first))
+    get_logger(queued=queued)
+    logger.info("name=Bob; email=bob@dylan.com; ip=1.2.3.4;")
+    set_log_target(logging.StreamHandler(second))
+    set_log_target(logging.StreamHandler(second))
+    assert get_logger(queued=queued) is logger
+    get_logger(queued=not queued)
+    get_logger(queued=queued)
+    for i in range(3):
+        logger.info("password=pwd%d; ssn=123;", i)
+    assert len(logger.handlers) == 1
+    logger.handlers[0].close()
+
+    lines = first.getvalue().splitlines()
+    assert len(lines) == 1
+    assert lines[0].endswith(": name=***; email=***; ip=1.2.3.4;")
+    lines = second.getvalue().splitlines()
+    assert len(lines) == 3
+    assert all(line.endswith(": password=***; ssn=***;") for line in lines)
@@ -2,15 +2,144 @@
 """
 Authentication module for the API
 """
-from typing import List, TypeVar
+from functools import lru_cache
+from typing import List, Tuple, TypeVar
 from flask import request
 import os
+import time
+
+
+TERMINAL = ''
+
+
+class PathMatcher:
+    """
+    Excluded paths compiled once for lookups whose cost does not depend on
+    how many there are: a set of the exact paths and a prefix trie of the
+    paths ending with the "*" wildcard
+    """
+
+    def __init__(self, excluded_paths: List[str]):
+        """
+        Compiles a list of excluded paths
+
+        Args:
+            excluded_paths (List[str]): The paths, "*" ending a path
+            matching any characters.
+        """
+        self.exact = set()
+        self.prefixes = {}
+        self.size = 0
+        for excluded_path in excluded_paths:
+            if excluded_path.endswith('*'):
+                node = self.prefixes
+                for char in excluded_path[:-1]:
+                    node = node.setdefault(char, {})
+                node[TERMINAL] = True
+            else:
+                self.exact.add(excluded_path)
+            self.size += 1
+
+    def __len__(self) -> int:
+        """
+        Returns the number of compiled paths
+        """
+        return self.size
+
+    def matches(self, path: str) -> bool:
+        """
+        Checks if a path, normalized to end with '/', is excluded
+
+        Args:
+            path (str): The path to check.
+
+        Returns:
+            bool: True if the path is excluded, False otherwise.
+        """
+        path = path.rstrip('/') + '/'
+        if path in self.exact:
+            return True
+        node = self.prefixes
+        for char in path:
+            if TERMINAL in node:
+                return True
+            node = node.get(char)
+            if node is None:
+                return False
+        return TERMINAL in node
+
+
+@lru_cache(maxsize=32)
+def compile_paths(excluded_paths: Tuple[str, ...]) -> PathMatcher:
+    """
+    Returns the PathMatcher of excluded paths, compiled once per list
+
+    Args:
+        excluded_paths (Tuple[str, ...]): The excluded paths.
+
+    Returns:
+        PathMatcher: The compiled paths.
+    """
+    return PathMatcher(excluded_paths)
+
+
+class AuthContext:
+    """
+    Credentials of one request, extracted once, with the user they
+    resolve to and the seconds spent in each stage of the resolution
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty context
+        """
+        self.authorization = None
+        self.session_id = None
+        self.user = None
+        self.timings = {}
+
+    def record(self, name: str, start: float) -> float:
+        """
+        Adds the time elapsed since start to a stage
+
+        Args:
+            name (str): The stage: extract, cache, decode, lookup or
+            verify.
+            start (float): The time.perf_counter() the stage started at.
+
+        Returns:
+            float: The current time.perf_counter(), for the next stage.
+        """
+        now = time.perf_counter()
+        self.timings[name] = self.timings.get(name, 0) + now - start
+        return now
+
+    def server_timing(self) -> str:
+        """
+        Returns the stage timings as a Server-Timing header value
+
+        Returns:
+            str: One auth-<stage> metric per stage, in milliseconds.
+        """
+        return ", ".join("auth-{};dur={:.3f}".format(name, seconds * 1e3)
+                         for name, seconds in self.timings.items())
 
 
 class Auth:
     """
     Auth class for managing API authentication
+    - the configuration is read from the environment once, at creation
+    - authenticate() resolves the user of a request in one pass
     """
+
+    def __init__(self):
+        """
+        Reads the configuration from the environment
+        """
+        self.session_cookie_name = os.getenv("SESSION_NAME",
+                                             "_my_session_id")
+        self.stage_totals = {}
+
     def authorization_header(self, request=None) -> str:
         """
         Retrieves the authorization header
@@ -32,8 +161,9 @@ class Auth:
         Args:
             path (str): The path to check for authentication requirement.
             excluded_paths (List[str]): A list of paths that are excluded
-            from authentication. The paths in this list can contain "*" as
-            a wildcard to match any characters.
+            from authentication, or the PathMatcher compiled from it. The
+            paths in this list can contain "*" as a wildcard to match any
+            characters.
 
         Returns:
             bool: True if authentication is required, False otherwise.
@@ -41,17 +171,9 @@ class Auth:
         if path is None or excluded_paths is None or len(excluded_paths) == 0:
             return True
 
-        # Normalize paths by ensuring they end with '/'
-        path = path.rstrip('/') + '/'
-
-        for excluded_path in excluded_paths:
-            if excluded_path.endswith('*') and path.startswith(
-                    excluded_path[:-1]):
-                return False
-            elif path == excluded_path:
-                return False
-
-        return True
+        if not isinstance(excluded_paths, PathMatcher):
+            excluded_paths = compile_paths(tuple(excluded_paths))
+        return not excluded_paths.matches(path)
 
     def current_user(self, request=None) -> TypeVar('User'):
         """
@@ -63,8 +185,54 @@ class Auth:
         Returns:
             TypeVar('User'): The current user.
         """
+        return self.authenticate(request).user
+
+    def authenticate(self, request=None) -> AuthContext:
+        """
+        Extracts the credentials of a request once and resolves its user
+
+        Args:
+            request: The Flask request object.
+
+        Returns:
+            AuthContext: The credentials, the user (None if they match
+            nobody) and the time spent in each stage.
+        """
+        context = AuthContext()
+        start = time.perf_counter()
+        context.authorization = self.authorization_header(request)
+        context.session_id = self.session_cookie(request)
+        context.record("extract", start)
+        context.user = self.user_for_context(context)
+        for name, seconds in context.timings.items():
+            totals = self.stage_totals.setdefault(name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+        return context
+
+    def user_for_context(self, context: AuthContext) -> TypeVar('User'):
+        """
+        Resolves the user of extracted credentials
+
+        Args:
+            context (AuthContext): The credentials of the request.
+
+        Returns:
+            TypeVar('User'): The user, or None.
+        """
         return None
 
+    def timing_metrics(self) -> dict:
+        """
+        Returns the mean time of each authentication stage
+
+        Returns:
+            dict: The number of requests and the mean microseconds per
+            stage.
+        """
+        return {name: {"count": count, "mean_us": seconds / count * 1e6}
+                for name, (count, seconds) in self.stage_totals.items()}
+
     def session_cookie(self, request=None) -> str:
         """
         Returns a cookie value from a request
@@ -79,5 +247,4 @@ class Auth:
         if request is None:
             return None
 
-        session_name = os.getenv("SESSION_NAME", "_my_session_id")
-        return request.cookies.get(session_name)
+        return request.cookies.get(self.session_cookie_name)
@@ -4,82 +4,66 @@ Basic Authentication module for the API
 """
 
 import base64
+import time
 from flask import request
-from typing import List, TypeVar
+from os import getenv
+from typing import TypeVar
+from api.v1.auth.auth import Auth, AuthContext
+from api.v1.auth.credential_cache import CredentialCache
 from models.user import User
 
 
-class BasicAuth:
+class BasicAuth(Auth):
     """
     BasicAuth class for managing Basic Authentication
     """
 
-    def authorization_header(self, request=None) -> str:
+    def __init__(self):
         """
-        Retrieves the authorization header
-
-        Args:
-            request: The Flask request object.
-
-        Returns:
-            str: The authorization header.
+        Initializes the cache of verified credentials, sized by
+        BASIC_AUTH_CACHE_SIZE (0 disables it) with entries expiring after
+        BASIC_AUTH_CACHE_TTL seconds
         """
-        if request is None or 'Authorization' not in request.headers:
-            return None
-        return request.headers.get('Authorization')
+        super().__init__()
+        self.credential_cache = CredentialCache(
+            int(getenv("BASIC_AUTH_CACHE_SIZE", "1024")),
+            float(getenv("BASIC_AUTH_CACHE_TTL", "300")))
 
-    def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
+    def user_for_context(self, context: AuthContext) -> TypeVar('User'):
         """
-        Checks if authentication is required for the given path
+        Resolves the user of the Authorization header, from the cache of
+        verified credentials when the same header was seen recently
 
         Args:
-            path (str): The path to check for authentication requirement.
-            excluded_paths (List[str]): A list of paths that are excluded
-            from authentication.
-
-        Returns:
-            bool: True if authentication is required, False otherwise.
-        """
-        if path is None or excluded_paths is None or len(excluded_paths) == 0:
-            return True
-
-        # Normalize paths by ensuring they end with '/'
-        path = path.rstrip('/') + '/'
-
-        for excluded_path in excluded_paths:
-            if path == excluded_path:
-                return False
-
-        return True
-
-    def current_user(self, request=None) -> TypeVar('User'):
-        """
-        Retrieves the current user
-
-        Args:
-            request: The Flask request object.
+            context (AuthContext): The credentials of the request.
 
         Returns:
             TypeVar('User'): The current user.
         """
-        authorization_header = self.authorization_header(request)
+        authorization_header = context.authorization
         if not authorization_header:
             return None
 
+        start = time.perf_counter()
+        user = self.credential_cache.get(authorization_header)
+        start = context.record("cache", start)
+        if user is not None:
+            return user
+
         base64_header = self.extract_base64_authorization_header(
                 authorization_header)
-        if not base64_header:
-            return None
-
-        decoded_header = self.decode_base64_authorization_header(base64_header)
-        if not decoded_header:
-            return None
-
+        decoded_header = self.decode_base64_authorization_header(
+                base64_header)
         user_email, user_pwd = self.extract_user_credentials(decoded_header)
+        context.record("decode", start)
         if not user_email or not user_pwd:
             return None
 
-        return self.user_object_from_credentials(user_email, user_pwd)
+        user = self.user_object_from_credentials(user_email, user_pwd,
+                                                 context)
+        if user is not None:
+            self.credential_cache.put(authorization_header, user)
+        return user
 
     def extract_base64_authorization_header(
             self, authorization_header: str) -> str:
@@ -150,13 +134,16 @@ class BasicAuth:
         return email, password
 
     def user_object_from_credentials(
-            self, user_email: str, user_pwd: str) -> TypeVar('User'):
+            self, user_email: str, user_pwd: str,
+            context: AuthContext = None) -> TypeVar('User'):
         """
         Retrieves the User instance based on email and password
 
         Args:
             user_email (str): The user's email.
             user_pwd (str): The user's password.
+            context (AuthContext): The context timing the lookup and
+            verify stages, if any.
 
         Returns:
             TypeVar('User'): The User instance, or None if not found or
@@ -166,12 +153,18 @@ class BasicAuth:
            user_pwd is None or not isinstance(user_pwd, str):
             return None
 
+        if context is None:
+            context = AuthContext()
+        start = time.perf_counter()
         users = User.search({'email': user_email})
+        start = context.record("lookup", start)
         if not users:
             return None
 
         user = users[0]
-        if not user.is_valid_password(user_pwd):
+        valid = user.is_valid_password(user_pwd)
+        context.record("verify", start)
+        if not valid:
             return None
 
         return user
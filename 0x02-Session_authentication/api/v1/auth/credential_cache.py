@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Verified-credential cache module for the API
+"""
+from collections import OrderedDict
+from typing import TypeVar
+import hashlib
+import os
+import threading
+import time
+
+
+class CredentialCache:
+    """
+    Bounded TTL and LRU cache mapping Authorization headers that were
+    verified to their user
+    - headers are keyed by their BLAKE2b MAC under a per-process secret,
+      so no credential is kept in memory
+    - an entry remembers the User and the email and password hash it was
+      verified against: a hit on a user that was removed or reloaded, or
+      whose email or password changed, drops the entry and counts as a
+      miss
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300):
+        """
+        Initialize an empty cache
+
+        Args:
+            max_size (int): The number of headers kept, 0 disables the cache.
+            ttl (float): The seconds an entry stays valid.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._secret = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, authorization_header: str) -> bytes:
+        """
+        Returns the keyed hash of an Authorization header
+
+        Args:
+            authorization_header (str): The raw Authorization header.
+
+        Returns:
+            bytes: The keyed BLAKE2b digest of the header.
+        """
+        return hashlib.blake2b(authorization_header.encode(),
+                               key=self._secret, digest_size=16).digest()
+
+    def get(self, authorization_header: str) -> TypeVar('User'):
+        """
+        Returns the user an Authorization header was verified for
+
+        Args:
+            authorization_header (str): The raw Authorization header.
+
+        Returns:
+            TypeVar('User'): The User, or None if the header is not cached,
+            has expired or its user changed.
+        """
+        if self.max_size <= 0:
+            return None
+        key = self.key(authorization_header)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        user = None
+        if entry is not None and entry[0] > time.monotonic():
+            user = entry[1]
+            if not user.is_stored() or \
+                    (user.email, user.password) != entry[2:]:
+                user = None
+        if user is None:
+            if entry is not None:
+                self.discard(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return user
+
+    def put(self, authorization_header: str, user: TypeVar('User')):
+        """
+        Caches the user an Authorization header was verified for
+
+        Args:
+            authorization_header (str): The raw Authorization header.
+            user (User): The User its credentials matched.
+        """
+        if self.max_size <= 0:
+            return
+        key = self.key(authorization_header)
+        entry = (time.monotonic() + self.ttl, user, user.email,
+                 user.password)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: bytes):
+        """
+        Drops one entry
+
+        Args:
+            key (bytes): The keyed hash of its header.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self, user_id: str = None):
+        """
+        Drops the entries of a user, or all entries
+
+        Args:
+            user_id (str): The ID of the user, None for everyone.
+        """
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+                return
+            for key in [key for key, entry in self._entries.items()
+                        if entry[1].id == user_id]:
+                del self._entries[key]
+
+    def metrics(self) -> dict:
+        """
+        Returns the counters of the cache
+
+        Returns:
+            dict: The size, hits, misses and hit rate.
+        """
+        hits, misses = self.hits, self.misses
+        return {"size": len(self._entries), "hits": hits, "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
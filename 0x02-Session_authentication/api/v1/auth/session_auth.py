@@ -2,23 +2,38 @@
 """
 Session Authentication module for the API
 """
-from typing import Optional
-from api.v1.auth.auth import Auth
-from flask import request
+from os import getenv
+from typing import Optional, TypeVar
+import time
+import uuid
+from api.v1.auth.auth import Auth, AuthContext
+from api.v1.auth.session_store import make_session_store
+from models.user import User
 
 
 class SessionAuth(Auth):
     """
     SessionAuth class for managing API session authentication
+    - sessions are kept by the SESSION_STORE backend: "memory" (default),
+      "sqlite" or "shm", in the file SESSION_STORE_PATH
+    - they expire SESSION_DURATION seconds after login, or
+      SESSION_IDLE_DURATION seconds after their last request (0 disables
+      either)
+    - expired sessions are evicted every SESSION_SWEEP_INTERVAL seconds,
+      at most SESSION_SWEEP_LIMIT of them looked at per sweep
     """
 
     def __init__(self):
         """
         Constructor
         """
-        self.session_cookie_name = request.environ.get(
-                'SESSION_NAME', '_my_session_id')
-        self.user_id_by_session_id = {}
+        super().__init__()
+        self.session_store = make_session_store(
+            getenv("SESSION_STORE", "memory"), getenv("SESSION_STORE_PATH"),
+            ttl=int(getenv("SESSION_DURATION", "86400")),
+            idle=int(getenv("SESSION_IDLE_DURATION", "0")),
+            sweep_interval=float(getenv("SESSION_SWEEP_INTERVAL", "1")),
+            sweep_limit=int(getenv("SESSION_SWEEP_LIMIT", "1000")))
 
     def create_session(self, user_id: str = None) -> Optional[str]:
         """
@@ -28,11 +43,12 @@ class SessionAuth(Auth):
             user_id (str): The user ID.
 
         Returns:
-            str: The session ID.
+            str: The session ID, or None if user_id is not a string.
         """
-        session_id = super().create_session(user_id)
-        if session_id:
-            self.user_id_by_session_id[session_id] = user_id
+        if user_id is None or not isinstance(user_id, str):
+            return None
+        session_id = str(uuid.uuid4())
+        self.session_store.put(session_id, user_id)
         return session_id
 
     def user_id_for_session_id(self, session_id: str = None) -> Optional[str]:
@@ -43,26 +59,29 @@ class SessionAuth(Auth):
             session_id (str): The session ID.
 
         Returns:
-            str: The user ID.
+            str: The user ID, or None if the session is unknown or expired.
         """
-        return self.user_id_by_session_id.get(session_id)
+        if session_id is None or not isinstance(session_id, str):
+            return None
+        return self.session_store.get(session_id)
 
-    def current_user(self, request=None):
+    def user_for_context(self, context: AuthContext) -> TypeVar('User'):
         """
         Retrieves the current user based on the session ID
 
         Args:
-            request: The Flask request object.
+            context (AuthContext): The credentials of the request.
 
         Returns:
             User: The current user.
         """
-        session_id = self.session_cookie(request)
-        if session_id:
-            user_id = self.user_id_for_session_id(session_id)
-            if user_id:
-                return User.get(user_id)
-        return None
+        if not context.session_id:
+            return None
+        start = time.perf_counter()
+        user_id = self.user_id_for_session_id(context.session_id)
+        user = User.get(user_id) if user_id else None
+        context.record("lookup", start)
+        return user
 
     def destroy_session(self, request=None) -> bool:
         """
@@ -82,11 +101,4 @@ class SessionAuth(Auth):
         if not session_id:
             return False
 
-        user_id = self.user_id_for_session_id(session_id)
-        if not user_id:
-            return False
-
-        if session_id in self.user_id_by_session_id:
-            del self.user_id_by_session_id[session_id]
-            return True
-        return False
+        return self.session_store.delete(session_id)
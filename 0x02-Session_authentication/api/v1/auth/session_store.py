@@ -0,0 +1,795 @@
+#!/usr/bin/env python3
+"""
+Session store module for the API
+"""
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+import fcntl
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+
+
+RATE_WINDOW = 60
+TOUCH_FRACTION = 0.1
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: a deadline goes in the bucket of its tick, modulo
+    the number of slots, with the number of revolutions left before it is
+    due, so scheduling is O(1) and expiring only visits the buckets of the
+    ticks that elapsed
+    - keys are never cancelled: expire() asks for the current deadline of
+      each key it finds due and reschedules the ones that moved
+    - a visited key with revolutions left is put back one revolution
+      later, never in the tick being visited
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 4096):
+        """
+        Initialize an empty wheel
+
+        Args:
+            tick (float): The seconds covered by a bucket.
+            slots (int): The number of buckets.
+        """
+        self.tick = tick
+        self.slots = slots
+        self.buckets = {}
+        self.draining = {}
+        self.next = int(time.time() // tick)
+
+    def schedule(self, key: str, deadline: float):
+        """
+        Puts a key in the bucket of its deadline
+
+        Args:
+            key (str): The key.
+            deadline (float): The time.time() it is due at.
+        """
+        tick = max(int(deadline // self.tick), self.next)
+        self.buckets.setdefault(tick % self.slots, {})[key] = \
+            (tick - self.next) // self.slots
+
+    def expire(self, now: float, limit: int,
+               deadline_of: Callable[[str], Optional[float]]) -> List[str]:
+        """
+        Visits the buckets of the ticks elapsed before now, at most limit
+        keys and buckets, resuming where it stopped on the next call
+
+        Args:
+            now (float): The current time.time().
+            limit (int): The maximum number of keys and buckets to visit.
+            deadline_of (Callable): Returns the current deadline of a key,
+            None if it is gone or never expires.
+
+        Returns:
+            List[str]: The keys due before now.
+        """
+        now_tick = int(now // self.tick)
+        expired = []
+        work = 0
+        while work < limit:
+            if not self.draining:
+                if self.next >= now_tick:
+                    break
+                self.draining = self.buckets.pop(self.next % self.slots, {})
+                self.next += 1
+                work += 1
+                continue
+            key, rounds = self.draining.popitem()
+            work += 1
+            if rounds > 0:
+                self.buckets.setdefault((self.next - 1) % self.slots, {})[
+                    key] = rounds - 1
+                continue
+            deadline = deadline_of(key)
+            if deadline is None:
+                continue
+            if deadline <= now:
+                expired.append(key)
+            else:
+                self.schedule(key, deadline)
+        return expired
+
+
+class SessionStore(ABC):
+    """
+    Interface of the stores mapping session IDs to user IDs: a backend
+    missing one of the abstract methods cannot be created
+    - a session expires ttl seconds after its creation, or idle seconds
+      after its last lookup, whichever comes first (0 disables either)
+    - a background sweeper evicts expired sessions every sweep_interval
+      seconds (0 to call sweep() yourself), at most sweep_limit of them
+      per tick; lookups never return expired sessions the sweeper has not
+      reached yet
+    """
+
+    def __init__(self, ttl: float = 0, idle: float = 0,
+                 sweep_interval: float = 1.0, sweep_limit: int = 1000):
+        """
+        Initialize the store
+
+        Args:
+            ttl (float): The seconds a session lives, 0 for ever.
+            idle (float): The seconds a session lives unused, 0 for ever.
+            sweep_interval (float): The seconds between two sweeps.
+            sweep_limit (int): The most sessions looked at per sweep.
+        """
+        self.ttl = ttl
+        self.idle = idle
+        self.sweep_interval = sweep_interval
+        self.sweep_limit = sweep_limit
+        self.evictions = 0
+        self._sweeps = deque()
+        self._sweeper_pid = None
+        self._closed = threading.Event()
+
+    def expires_at(self) -> float:
+        """
+        Returns the absolute expiry time of a session created now
+
+        Returns:
+            float: The time.time() it expires at, 0 if it never does.
+        """
+        return time.time() + self.ttl if self.ttl > 0 else 0
+
+    def deadline(self, expires_at: float, seen_at: float) -> float:
+        """
+        Returns when a session expires: at its absolute expiry or idle
+        seconds after it was last seen, whichever comes first
+
+        Args:
+            expires_at (float): The absolute expiry time, 0 for never.
+            seen_at (float): The time.time() of its last lookup.
+
+        Returns:
+            float: The time.time() it expires at, 0 if it never does.
+        """
+        if self.idle <= 0:
+            return expires_at
+        idle_at = seen_at + self.idle
+        return idle_at if expires_at == 0 else min(expires_at, idle_at)
+
+    @staticmethod
+    def expired(deadline: float, now: float) -> bool:
+        """
+        Checks if a session expiring at deadline is expired
+
+        Args:
+            deadline (float): The expiry time, 0 for never.
+            now (float): The current time.time().
+
+        Returns:
+            bool: True if the session is expired.
+        """
+        return 0 < deadline <= now
+
+    def stale(self, seen_at: float, now: float) -> bool:
+        """
+        Checks if the last lookup time of a session should be written
+        again: stores for which it costs a write only refresh it after
+        TOUCH_FRACTION of the idle timeout
+
+        Args:
+            seen_at (float): The time.time() of its last recorded lookup.
+            now (float): The current time.time().
+
+        Returns:
+            bool: True if seen_at should become now.
+        """
+        return self.idle > 0 and now - seen_at > self.idle * TOUCH_FRACTION
+
+    @abstractmethod
+    def put(self, session_id: str, user_id: str):
+        """
+        Stores a session
+
+        Args:
+            session_id (str): The session ID.
+            user_id (str): The ID of its user.
+        """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[str]:
+        """
+        Retrieves the user ID of a live session, refreshing its idle
+        timeout
+
+        Args:
+            session_id (str): The session ID.
+
+        Returns:
+            str: The user ID, or None if the session is unknown or expired.
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """
+        Deletes a session
+
+        Args:
+            session_id (str): The session ID.
+
+        Returns:
+            bool: True if a live session was deleted.
+        """
+
+    @abstractmethod
+    def sweep(self, limit: int) -> int:
+        """
+        Evicts expired sessions, looking at no more than limit of them
+
+        Args:
+            limit (int): The most sessions to look at.
+
+        Returns:
+            int: The number of sessions evicted.
+        """
+
+    @abstractmethod
+    def active(self) -> int:
+        """
+        Counts the live sessions
+
+        Returns:
+            int: The number of sessions not expired.
+        """
+
+    def close(self):
+        """
+        Releases the resources of the store and stops its sweeper
+        """
+        self._closed.set()
+
+    def start_sweeper(self):
+        """
+        Starts the sweeper thread of this process, unless it runs already,
+        is disabled or sessions never expire
+        """
+        if self._sweeper_pid == os.getpid() or self.sweep_interval <= 0 or \
+                (self.ttl <= 0 and self.idle <= 0):
+            return
+        self._sweeper_pid = os.getpid()
+        threading.Thread(target=self.run_sweeper, daemon=True).start()
+
+    def run_sweeper(self):
+        """
+        Sweeps every sweep_interval seconds, recording the evictions,
+        until the store is closed
+        """
+        while not self._closed.wait(self.sweep_interval):
+            self.record_evictions(self.sweep(self.sweep_limit))
+
+    def record_evictions(self, count: int):
+        """
+        Adds the evictions of one sweep to the counters
+
+        Args:
+            count (int): The number of sessions evicted.
+        """
+        now = time.monotonic()
+        self.evictions += count
+        self._sweeps.append((now, count))
+        while self._sweeps[0][0] < now - RATE_WINDOW:
+            self._sweeps.popleft()
+
+    def metrics(self) -> dict:
+        """
+        Returns the counters of the store
+
+        Returns:
+            dict: The live sessions, the evictions and the evictions per
+            second over the last RATE_WINDOW seconds.
+        """
+        sweeps = list(self._sweeps)
+        rate = 0.0
+        if len(sweeps) > 0:
+            elapsed = max(time.monotonic() - sweeps[0][0],
+                          self.sweep_interval)
+            rate = sum(count for at, count in sweeps) / elapsed
+        return {"active": self.active(), "evictions": self.evictions,
+                "evictions_per_second": rate}
+
+
+class MemoryStore(SessionStore):
+    """
+    Sessions in a dict of this process, with their deadlines in a
+    TimerWheel ticking every sweep_interval seconds
+    """
+
+    def __init__(self, ttl: float = 0, idle: float = 0,
+                 sweep_interval: float = 1.0, sweep_limit: int = 1000):
+        """
+        Initialize an empty store
+        """
+        super().__init__(ttl, idle, sweep_interval, sweep_limit)
+        self._sessions = {}
+        self._wheel = TimerWheel(sweep_interval or 1.0)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """
+        Returns the number of stored sessions, expired ones included
+        """
+        return len(self._sessions)
+
+    def deadline_of(self, session_id: str) -> Optional[float]:
+        """
+        Returns the current deadline of a session, None if it is gone or
+        never expires
+        """
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        return self.deadline(entry[1], entry[2]) or None
+
+    def put(self, session_id: str, user_id: str):
+        """
+        Stores a session and schedules its deadline
+        """
+        now = time.time()
+        entry = [user_id, self.expires_at(), now]
+        deadline = self.deadline(entry[1], entry[2])
+        with self._lock:
+            self._sessions[session_id] = entry
+            if deadline > 0:
+                self._wheel.schedule(session_id, deadline)
+        self.start_sweeper()
+
+    def get(self, session_id: str) -> Optional[str]:
+        """
+        Retrieves the user ID of a live session; the wheel finds its new
+        deadline when its old one comes
+        """
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        now = time.time()
+        if self.expired(self.deadline(entry[1], entry[2]), now):
+            return None
+        entry[2] = now
+        return entry[0]
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Deletes a session, leaving its wheel entry to be skipped
+        """
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        return entry is not None and not self.expired(
+            self.deadline(entry[1], entry[2]), time.time())
+
+    def sweep(self, limit: int) -> int:
+        """
+        Evicts the sessions found due in the elapsed ticks of the wheel
+        """
+        with self._lock:
+            expired = self._wheel.expire(time.time(), limit,
+                                         self.deadline_of)
+            for session_id in expired:
+                del self._sessions[session_id]
+        return len(expired)
+
+    def active(self) -> int:
+        """
+        Counts the stored sessions, expired ones not swept yet included
+        """
+        return len(self._sessions)
+
+
+class SQLiteStore(SessionStore):
+    """
+    Sessions in a SQLite database in WAL mode, shared by every process
+    using the file and kept across restarts
+    - each thread of each process opens its own connection
+    - expires_at and seen_at are indexed, so a sweep deletes up to its
+      limit of expired rows without scanning the table
+    """
+
+    def __init__(self, path: str = ".db_sessions.sqlite", ttl: float = 0,
+                 idle: float = 0, sweep_interval: float = 1.0,
+                 sweep_limit: int = 1000):
+        """
+        Initialize the store, creating its table if needed
+
+        Args:
+            path (str): The database file.
+        """
+        super().__init__(ttl, idle, sweep_interval, sweep_limit)
+        self.path = path
+        self._local = threading.local()
+        connection = self.connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY"
+            " KEY, user_id TEXT NOT NULL, expires_at REAL NOT NULL,"
+            " seen_at REAL NOT NULL)")
+        connection.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at"
+                           " ON sessions (expires_at)")
+        connection.execute("CREATE INDEX IF NOT EXISTS sessions_seen_at"
+                           " ON sessions (seen_at)")
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the current thread and process
+
+        Returns:
+            sqlite3.Connection: An autocommit connection in WAL mode.
+        """
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = sqlite3.connect(self.path, timeout=30,
+                                               isolation_level=None)
+            local.connection.execute("PRAGMA journal_mode=WAL")
+            local.connection.execute("PRAGMA synchronous=NORMAL")
+            local.pid = os.getpid()
+        return local.connection
+
+    def put(self, session_id: str, user_id: str):
+        """
+        Stores a session
+        """
+        self.connection().execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+            (session_id, user_id, self.expires_at(), time.time()))
+        self.start_sweeper()
+
+    def get(self, session_id: str) -> Optional[str]:
+        """
+        Retrieves the user ID of a live session, writing its lookup time
+        once it is stale
+        """
+        connection = self.connection()
+        row = connection.execute(
+            "SELECT user_id, expires_at, seen_at FROM sessions"
+            " WHERE session_id = ?", (session_id,)).fetchone()
+        now = time.time()
+        if row is None or self.expired(self.deadline(row[1], row[2]), now):
+            return None
+        if self.stale(row[2], now):
+            connection.execute("UPDATE sessions SET seen_at = ?"
+                               " WHERE session_id = ?", (now, session_id))
+        return row[0]
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Deletes a session
+        """
+        connection = self.connection()
+        row = connection.execute(
+            "SELECT expires_at, seen_at FROM sessions WHERE session_id = ?",
+            (session_id,)).fetchone()
+        if row is None:
+            return False
+        connection.execute("DELETE FROM sessions WHERE session_id = ?",
+                           (session_id,))
+        return not self.expired(self.deadline(row[0], row[1]), time.time())
+
+    def expired_clause(self) -> str:
+        """
+        Returns the SQL condition of the expired rows, for a :now
+        parameter
+        """
+        clause = "(expires_at > 0 AND expires_at <= :now)"
+        if self.idle > 0:
+            clause += " OR seen_at <= :now - {}".format(float(self.idle))
+        return clause
+
+    def sweep(self, limit: int) -> int:
+        """
+        Deletes up to limit expired rows
+        """
+        cursor = self.connection().execute(
+            "DELETE FROM sessions WHERE rowid IN (SELECT rowid FROM sessions"
+            " WHERE {} LIMIT :limit)".format(self.expired_clause()),
+            {"now": time.time(), "limit": limit})
+        return cursor.rowcount
+
+    def active(self) -> int:
+        """
+        Counts the rows not expired
+        """
+        return self.connection().execute(
+            "SELECT COUNT(*) FROM sessions WHERE NOT ({})".format(
+                self.expired_clause()), {"now": time.time()}).fetchone()[0]
+
+    def close(self):
+        """
+        Closes the connection of the current thread
+        """
+        super().close()
+        if getattr(self._local, 'pid', None) == os.getpid():
+            self._local.connection.close()
+            self._local.pid = None
+
+
+class SharedMemoryStore(SessionStore):
+    """
+    Sessions in a fixed-size hash table in a memory-mapped file, shared by
+    the processes of one host (keep the file on a tmpfs like /dev/shm)
+    - header: b"SES2" and the number of slots
+    - slot: state, absolute expiry, last lookup time, session ID and user
+      ID (at most ID_SIZE bytes each), found by linear probing from the
+      CRC-32 of the session ID
+    - readers share an flock on the file, writers hold it alone; each
+      process reopens the file after a fork so its lock is its own
+    - a deletion empties its slot and shifts the rest of the probe run
+      back, so no tombstones are left behind; a sweep empties the expired
+      sessions, and the DELETED slots of older tables, of the next
+      sweep_limit slots, going round the table
+    """
+
+    MAGIC = b"SES2"
+    HEADER = struct.Struct(">4sI")
+    ID_SIZE = 64
+    SLOT = struct.Struct(">B7xdd{0}s{0}s".format(ID_SIZE))
+    EMPTY, USED, DELETED = range(3)
+
+    def __init__(self, path: str = "/dev/shm/hbtn_sessions",
+                 ttl: float = 0, idle: float = 0,
+                 sweep_interval: float = 1.0, sweep_limit: int = 1000,
+                 slots: int = 1 << 16):
+        """
+        Initialize the store, creating its file if needed
+
+        Args:
+            path (str): The table file.
+            slots (int): The capacity of a new table.
+        """
+        super().__init__(ttl, idle, sweep_interval, sweep_limit)
+        self.path = path
+        self.slots = slots
+        self._pid = None
+        self._cursor = 0
+        self._lock = threading.RLock()
+        self.open()
+
+    def open(self):
+        """
+        Maps the table file, creating it with self.slots empty slots if
+        it is empty
+        """
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, self.HEADER.size +
+                             self.slots * self.SLOT.size)
+                os.pwrite(self._fd, self.HEADER.pack(self.MAGIC, self.slots),
+                          0)
+            self._data = mmap.mmap(self._fd, 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        magic, self.slots = self.HEADER.unpack_from(self._data, 0)
+        if magic != self.MAGIC:
+            raise ValueError("Not a session table: {}".format(self.path))
+        self._pid = os.getpid()
+
+    @contextmanager
+    def locked(self, operation: int):
+        """
+        Holds the table lock of this process, then the lock of the file
+
+        Args:
+            operation (int): fcntl.LOCK_SH to read, fcntl.LOCK_EX to write.
+        """
+        if self._pid != os.getpid():
+            self._lock = threading.RLock()
+            self.open()
+        with self._lock:
+            fcntl.flock(self._fd, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def offset(self, index: int) -> int:
+        """
+        Returns the position of a slot in the file
+        """
+        return self.HEADER.size + index * self.SLOT.size
+
+    def slot_of(self, session_id: bytes, free: bool = False) -> int:
+        """
+        Finds the slot of a session ID (the caller holds the lock)
+
+        Args:
+            session_id (bytes): The encoded session ID.
+            free (bool): True to return the first reusable slot if the
+            session ID is not stored.
+
+        Returns:
+            int: The slot number, or -1.
+        """
+        now = time.time()
+        first_free = -1
+        index = zlib.crc32(session_id) % self.slots
+        for i in range(self.slots):
+            state, expires_at, seen_at, key, value = self.SLOT.unpack_from(
+                self._data, self.offset(index))
+            if state == self.EMPTY:
+                if not free:
+                    return -1
+                return first_free if first_free >= 0 else index
+            if state == self.USED and key.rstrip(b"\0") == session_id:
+                return index
+            if first_free < 0 and (state == self.DELETED or self.expired(
+                    self.deadline(expires_at, seen_at), now)):
+                first_free = index
+            index = (index + 1) % self.slots
+        return first_free if free else -1
+
+    def vacate(self, index: int):
+        """
+        Empties a slot, moving back the later sessions of its probe run
+        that are allowed there (the caller holds the lock)
+
+        Args:
+            index (int): The slot number.
+        """
+        hole = index
+        j = index
+        for i in range(self.slots - 1):
+            j = (j + 1) % self.slots
+            offset = self.offset(j)
+            state = self._data[offset]
+            if state == self.EMPTY:
+                break
+            if state == self.DELETED:
+                continue
+            key = self.SLOT.unpack_from(self._data, offset)[3]
+            home = zlib.crc32(key.rstrip(b"\0")) % self.slots
+            if (j - home) % self.slots >= (j - hole) % self.slots:
+                start = self.offset(hole)
+                self._data[start:start + self.SLOT.size] = \
+                    self._data[offset:offset + self.SLOT.size]
+                hole = j
+        self._data[self.offset(hole)] = self.EMPTY
+
+    def encode(self, value: str) -> bytes:
+        """
+        Encodes an ID for a slot
+
+        Args:
+            value (str): The session or user ID.
+
+        Returns:
+            bytes: Its UTF-8 encoding.
+        """
+        encoded = value.encode()
+        if len(encoded) > self.ID_SIZE:
+            raise ValueError("ID longer than {} bytes: {}".format(
+                self.ID_SIZE, value))
+        return encoded
+
+    def put(self, session_id: str, user_id: str):
+        """
+        Stores a session in its slot, or in the first free one
+        """
+        key, value = self.encode(session_id), self.encode(user_id)
+        with self.locked(fcntl.LOCK_EX):
+            index = self.slot_of(key, free=True)
+            if index < 0:
+                raise ValueError("Session table full: {}".format(self.path))
+            self.SLOT.pack_into(self._data, self.offset(index), self.USED,
+                                self.expires_at(), time.time(), key, value)
+        self.start_sweeper()
+
+    def get(self, session_id: str) -> Optional[str]:
+        """
+        Retrieves the user ID of a live session, writing its lookup time
+        once it is stale
+        """
+        key = self.encode(session_id)
+        with self.locked(fcntl.LOCK_SH):
+            index = self.slot_of(key)
+            if index < 0:
+                return None
+            state, expires_at, seen_at, key, value = self.SLOT.unpack_from(
+                self._data, self.offset(index))
+        now = time.time()
+        if self.expired(self.deadline(expires_at, seen_at), now):
+            return None
+        if self.stale(seen_at, now):
+            with self.locked(fcntl.LOCK_EX):
+                if self.slot_of(key.rstrip(b"\0")) == index:
+                    struct.pack_into(">d", self._data,
+                                     self.offset(index) + 16, now)
+        return value.rstrip(b"\0").decode()
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Deletes a session, shifting back the rest of its probe run
+        """
+        key = self.encode(session_id)
+        with self.locked(fcntl.LOCK_EX):
+            index = self.slot_of(key)
+            if index < 0:
+                return False
+            offset = self.offset(index)
+            expires_at, seen_at = self.SLOT.unpack_from(
+                self._data, offset)[1:3]
+            self.vacate(index)
+        return not self.expired(self.deadline(expires_at, seen_at),
+                                time.time())
+
+    def sweep(self, limit: int) -> int:
+        """
+        Empties the expired sessions and the tombstones of the next limit
+        slots; a slot a session was shifted back into is checked again
+        """
+        evicted = 0
+        now = time.time()
+        with self.locked(fcntl.LOCK_EX):
+            for i in range(min(limit, self.slots)):
+                state, expires_at, seen_at = self.SLOT.unpack_from(
+                    self._data, self.offset(self._cursor))[:3]
+                if state == self.USED and self.expired(
+                        self.deadline(expires_at, seen_at), now):
+                    self.vacate(self._cursor)
+                    evicted += 1
+                elif state == self.DELETED:
+                    self.vacate(self._cursor)
+                else:
+                    self._cursor = (self._cursor + 1) % self.slots
+        return evicted
+
+    def active(self) -> int:
+        """
+        Counts the live sessions of the whole table
+        """
+        count = 0
+        now = time.time()
+        with self.locked(fcntl.LOCK_SH):
+            for index in range(self.slots):
+                state, expires_at, seen_at = self.SLOT.unpack_from(
+                    self._data, self.offset(index))[:3]
+                if state == self.USED and not self.expired(
+                        self.deadline(expires_at, seen_at), now):
+                    count += 1
+        return count
+
+    def close(self):
+        """
+        Unmaps and closes the table file
+        """
+        super().close()
+        if self._pid == os.getpid():
+            self._data.close()
+            os.close(self._fd)
+            self._pid = None
+
+
+SESSION_STORES = {
+    "memory": MemoryStore,
+    "sqlite": SQLiteStore,
+    "shm": SharedMemoryStore,
+}
+
+
+def make_session_store(name: str = "memory", path: str = None,
+                       **options) -> SessionStore:
+    """
+    Creates a session store
+
+    Args:
+        name (str): The backend: "memory", "sqlite" or "shm".
+        path (str): The file of the sqlite and shm backends, None for
+        their default.
+        options: ttl, idle, sweep_interval and sweep_limit.
+
+    Returns:
+        SessionStore: The store.
+    """
+    if name not in SESSION_STORES:
+        raise ValueError("Unknown session store: {}".format(name))
+    if name == "memory" or path is None:
+        return SESSION_STORES[name](**options)
+    return SESSION_STORES[name](path, **options)
@@ -2,10 +2,17 @@
 """
 Initialize Flask Blueprint for API views
 """
-from flask import Blueprint
+from flask import Blueprint, Response
 
 app_views = Blueprint('app_views', __name__, url_prefix='/api/v1')
 
+
+def json_response(body: bytes, status: int = 200) -> Response:
+    """ Return a response carrying already encoded JSON
+    """
+    return Response(body, status=status, mimetype='application/json')
+
+
 from api.v1.views.index import *
 from api.v1.views.users import *
 from api.v1.views.session_auth import *
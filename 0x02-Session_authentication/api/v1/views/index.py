@@ -4,8 +4,6 @@
 from flask import jsonify, abort
 from api.v1.views import app_views
 
-app_views = Blueprint('app_views', __name__, url_prefix='/api/v1')
-
 
 @app_views.route('/status', methods=['GET'], strict_slashes=False)
 def status() -> str:
@@ -21,10 +19,22 @@ def stats() -> str:
     """ GET /api/v1/stats
     Return:
       - the number of each objects
+      - the hit rate of the to_json and credential caches
+      - the mean time of each authentication stage
+      - the active sessions and session evictions per second
     """
+    from api.v1.app import auth
+    from models.base import json_cache_stats
     from models.user import User
     stats = {}
     stats['users'] = User.count()
+    stats['json_cache'] = json_cache_stats()
+    if getattr(auth, 'credential_cache', None) is not None:
+        stats['credential_cache'] = auth.credential_cache.metrics()
+    if getattr(auth, 'session_store', None) is not None:
+        stats['sessions'] = auth.session_store.metrics()
+    if auth is not None:
+        stats['auth_timing'] = auth.timing_metrics()
     return jsonify(stats)
 
 
@@ -2,16 +2,15 @@
 """
 Session Authentication module for the API views
 """
-from flask import Blueprint, jsonify, request, abort
-from api.v1.app import auth
-
-
-app_views = Blueprint('session_auth', __name__, url_prefix='/api/v1')
+from flask import jsonify, request, abort
+from api.v1.views import app_views, json_response
+from models.user import User
 
 
 @app_views.route('/auth_session/login', methods=['POST'], strict_slashes=False)
 def login():
     """ Route for session authentication login """
+    from api.v1.app import auth
 
     email = request.form.get('email')
     password = request.form.get('password')
@@ -30,7 +29,7 @@ def login():
         return jsonify({"error": "wrong password"}), 401
 
     session_id = auth.create_session(user[0].id)
-    response = jsonify(user[0].to_json())
+    response = json_response(user[0].json_bytes())
     response.set_cookie(auth.session_cookie_name, session_id)
 
     return response
@@ -40,6 +39,7 @@ def login():
     'DELETE'], strict_slashes=False)
 def logout():
     """ Route for session authentication logout """
+    from api.v1.app import auth
 
     if not auth.destroy_session(request):
         abort(404)
@@ -1,19 +1,101 @@
 #!/usr/bin/env python3
 """ Module of Users views
 """
-from api.v1.views import app_views
-from flask import abort, jsonify, request
+from api.v1.views import app_views, json_response
+from flask import abort, jsonify, request, Response
+from models.base import encode_json
 from models.user import User
+from urllib.parse import urlencode
+
+
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK = 1000
+
+
+def project(user: User, fields: list = None) -> dict:
+    """ Return the JSON representation of a User, restricted to fields
+    """
+    user_json = user.to_json()
+    if fields is None:
+        return user_json
+    return {key: user_json[key] for key in fields if key in user_json}
+
+
+def encode_users(users: list, fields: list = None) -> bytes:
+    """ Return the comma separated JSON of Users, from their cached
+    encoding unless fields are projected
+    """
+    if fields is None:
+        return b','.join(user.json_bytes() for user in users)
+    return b','.join(encode_json(project(user, fields)) for user in users)
+
+
+def stream_users(after: str, offset: int, limit: int, fields: list):
+    """ Yield a JSON list of Users, STREAM_CHUNK of them at a time
+    """
+    yield b'['
+    separator = b''
+    while limit is None or limit > 0:
+        size = STREAM_CHUNK if limit is None else min(limit, STREAM_CHUNK)
+        users = User.page(after, offset, size)
+        if len(users) == 0:
+            break
+        yield separator + encode_users(users, fields)
+        separator = b','
+        after, offset = users[-1].id, 0
+        if limit is not None:
+            limit -= len(users)
+        if len(users) < size:
+            break
+    yield b']\n'
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (all optional):
+      - limit: page size, at most MAX_PAGE_SIZE
+      - cursor: ID of the last User of the previous page
+      - offset: number of Users to skip
+      - fields: comma separated attributes to return
+      - stream: 1 to stream the list instead of building it in memory
     Return:
-      - list of all User objects JSON represented
+      - list of all User objects JSON represented, in ID order when
+        paginated or streamed
+      - Link and X-Next-Cursor headers pointing to the next page
+      - 400 if a parameter is invalid
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    fields = request.args.get('fields')
+    if fields is not None:
+        fields = [field for field in fields.split(',') if field]
+    cursor = request.args.get('cursor')
+    try:
+        limit = request.args.get('limit')
+        limit = None if limit is None else int(limit)
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': "limit and offset must be integers"}), 400
+    if (limit is not None and limit <= 0) or offset < 0:
+        return jsonify({'error': "limit and offset must be positive"}), 400
+
+    if request.args.get('stream') == '1':
+        return Response(stream_users(cursor, offset, limit, fields),
+                        mimetype='application/json')
+    if limit is None and cursor is None and offset == 0:
+        return json_response(
+            b'[' + encode_users(User.all(), fields) + b']\n')
+
+    limit = min(limit or MAX_PAGE_SIZE, MAX_PAGE_SIZE)
+    users = User.page(cursor, offset, limit)
+    response = json_response(b'[' + encode_users(users, fields) + b']\n')
+    if len(users) == limit:
+        args = request.args.to_dict()
+        args.pop('offset', None)
+        args.update(cursor=users[-1].id, limit=limit)
+        response.headers['Link'] = '<{}?{}>; rel="next"'.format(
+            request.base_url, urlencode(args))
+        response.headers['X-Next-Cursor'] = users[-1].id
+    return response
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -30,7 +112,7 @@ def view_one_user(user_id: str = None) -> str:
     user = User.get(user_id)
     if user is None:
         abort(404)
-    return jsonify(user.to_json())
+    return json_response(user.json_bytes())
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -83,7 +165,7 @@ def create_user() -> str:
             user.first_name = rj.get("first_name")
             user.last_name = rj.get("last_name")
             user.save()
-            return jsonify(user.to_json()), 201
+            return json_response(user.json_bytes(), 201)
         except Exception as e:
             error_msg = "Can't create User: {}".format(e)
     return jsonify({'error': error_msg}), 400
@@ -119,4 +201,4 @@ def update_user(user_id: str = None) -> str:
     if rj.get('last_name') is not None:
         user.last_name = rj.get('last_name')
     user.save()
-    return jsonify(user.to_json()), 200
+    return json_response(user.json_bytes())
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+""" Benchmarks of the models and API
+"""
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+import uuid
+from base64 import b64encode
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from models.user import User
+
+
+@contextmanager
+def scratch_store():
+    """ Run the body in a temporary directory, so the .db_User files it
+    writes never touch the store of the working directory
+    """
+    cwd = os.getcwd()
+    User.journal().close()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            yield directory
+        finally:
+            User.journal().close()
+            os.chdir(cwd)
+
+
+def make_users(count: int):
+    """ Fill the User store in memory with count users
+    """
+    User.load_from_file()
+    for i in range(count):
+        user = User(email="user{}@hbtn.io".format(i))
+        User.store(user)
+
+
+def bench_search():
+    """ Time search by email, indexed and scanned, at 1k/100k/1M users
+    """
+    print("{:>8} {:>14} {:>14}".format("users", "indexed (us)", "scan (us)"))
+    for count in (1000, 100000, 1000000):
+        User.__indexes__ = ('email',)
+        make_users(count)
+        email = "user{}@hbtn.io".format(count // 2)
+        number, total = timeit.Timer(
+            lambda: User.search({'email': email})).autorange()
+        indexed = total / number
+        User.__indexes__ = ()
+        number, total = timeit.Timer(
+            lambda: User.search({'email': email})).autorange()
+        print("{:>8} {:>14.1f} {:>14.1f}".format(
+            count, indexed * 1e6, total / number * 1e6))
+    User.__indexes__ = ('email',)
+
+
+def bench_query(count: int = 100000):
+    """ Time a created_at range and an email prefix query returning 1000
+    of count users, by sorted index and by filtering User.all()
+    """
+    User.load_from_file()
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        User.store(User(email="user{:07d}@hbtn.io".format(i),
+                        created_at=start + timedelta(minutes=i)))
+    low = start + timedelta(minutes=count // 2)
+    high = low + timedelta(minutes=1000)
+    prefix = "user{:07d}".format(count // 2)[:-3]
+    list(User.query('created_at', limit=1))
+    list(User.query('email', limit=1))
+    queries = {
+        "created_at range": (
+            lambda: list(User.query('created_at', low, high)),
+            lambda: [user for user in User.all()
+                     if low <= user.created_at < high]),
+        "email prefix": (
+            lambda: list(User.query('email', prefix=prefix)),
+            lambda: [user for user in User.all()
+                     if user.email.startswith(prefix)]),
+    }
+    print("{:>18} {:>8} {:>12} {:>12}".format(
+        "query", "results", "index (ms)", "filter (ms)"))
+    for name, (indexed, filtered) in queries.items():
+        results = len(indexed())
+        times = [timeit.Timer(query).autorange()
+                 for query in (indexed, filtered)]
+        print("{:>18} {:>8} {:>12.2f} {:>12.2f}".format(
+            name, results, *(total / number * 1e3
+                             for number, total in times)))
+
+
+def bench_load(count: int = 100000):
+    """ Time User.load_from_file on a scratch store of count users and
+    report the peak RSS
+    """
+    objs_json = {}
+    for i in range(count):
+        obj_id = str(uuid.uuid4())
+        objs_json[obj_id] = {
+            "id": obj_id, "email": "user{}@hbtn.io".format(i),
+            "_password": "0" * 64, "first_name": "Bob", "last_name": None,
+            "created_at": "2024-02-21T10:00:00",
+            "updated_at": "2024-02-21T10:00:00"}
+    with scratch_store():
+        with open(".db_User.json", "w") as f:
+            json.dump(objs_json, f)
+        del objs_json
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        User.load_from_file()
+        elapsed = time.perf_counter() - start
+    print("load_from_file: {} users in {:.2f}s, peak RSS +{:.1f} MB".format(
+        User.count(), elapsed,
+        (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) / 1024))
+
+
+def bench_memory(count: int = 100000):
+    """ Report the bytes allocated per User, with its email and password
+    """
+    users = []
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        user = User(email="user{}@hbtn.io".format(i), _password="0" * 64)
+        users.append(user)
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    print("{} users: {:.0f} bytes per user".format(count, size / count))
+
+
+def bench_formats(count: int = 100000):
+    """ Compare save time, load time (with every object built) and size
+    of each snapshot format, in a scratch store
+    """
+    print("{:>8} {:>10} {:>10} {:>10}".format(
+        "format", "save (s)", "load (s)", "size (MB)"))
+    with scratch_store():
+        for storage in ("json", "binary"):
+            User.__storage__ = storage
+            make_users(count)
+            start = time.perf_counter()
+            User.save_to_file()
+            saving = time.perf_counter() - start
+            start = time.perf_counter()
+            User.load_from_file()
+            User.all()
+            loading = time.perf_counter() - start
+            size = os.path.getsize(User.snapshot_path())
+            os.remove(User.snapshot_path())
+            print("{:>8} {:>10.2f} {:>10.2f} {:>10.1f}".format(
+                storage, saving, loading, size / 1e6))
+    User.__storage__ = "json"
+
+
+def bench_users(count: int = 100000):
+    """ Time GET /api/v1/users at count users: the whole list, one page
+    and the streamed list, with its time to first byte (the first list
+    fills the to_json cache, the first page builds the ID index)
+    """
+    from api.v1.app import app
+    make_users(count)
+    user = User(email="bench@hbtn.io")
+    user.password = "bench"
+    User.store(user)
+    headers = {"Authorization": "Basic " + b64encode(
+        b"bench@hbtn.io:bench").decode()}
+    client = app.test_client()
+    print("{:>32} {:>10} {:>10} {:>10}".format(
+        "request", "first (ms)", "total (ms)", "size (MB)"))
+    for url in ("/api/v1/users", "/api/v1/users?limit=100",
+                "/api/v1/users?limit=100&fields=id,email",
+                "/api/v1/users?stream=1", "/api/v1/users"):
+        start = time.perf_counter()
+        response = client.get(url, headers=headers, buffered=False)
+        chunks = iter(response.response)
+        size = len(next(chunks))
+        first = time.perf_counter() - start
+        size += sum(len(chunk) for chunk in chunks)
+        total = time.perf_counter() - start
+        response.close()
+        print("{:>32} {:>10.1f} {:>10.1f} {:>10.1f}".format(
+            url[len("/api/v1"):], first * 1e3, total * 1e3, size / 1e6))
+
+
+def bench_auth(count: int = 100000):
+    """ Time BasicAuth.current_user at count users with the credential
+    cache off and on, then check that a password change and a removal revoke
+    the cached credentials
+    """
+    from api.v1.app import app, auth
+    make_users(count)
+    user = User(email="bench@hbtn.io")
+    user.password = "bench"
+    User.store(user)
+    headers = {"Authorization": "Basic " + b64encode(
+        b"bench@hbtn.io:bench").decode()}
+    with app.test_request_context(headers=headers) as context:
+        for size in (0, 1024):
+            auth.credential_cache.max_size = size
+            number, total = timeit.Timer(
+                lambda: auth.current_user(context.request)).autorange()
+            print("cache size {:>4}: {:.1f} us per current_user".format(
+                size, total / number * 1e6))
+    client = app.test_client()
+    print(auth.credential_cache.metrics())
+    user.password = "changed"
+    changed = client.get("/api/v1/stats", headers=headers).status_code
+    user.password = "bench"
+    restored = client.get("/api/v1/stats", headers=headers).status_code
+    User.discard(user.id)
+    removed = client.get("/api/v1/stats", headers=headers).status_code
+    print("password changed: {}, restored: {}, user removed: {}".format(
+        changed, restored, removed))
+
+
+def linear_require_auth(path: str, excluded_paths: list) -> bool:
+    """ Auth.require_auth as it was: a scan of the excluded paths
+    """
+    path = path.rstrip('/') + '/'
+    for excluded_path in excluded_paths:
+        if excluded_path.endswith('*') and path.startswith(
+                excluded_path[:-1]):
+            return False
+        elif path == excluded_path:
+            return False
+    return True
+
+
+def bench_routes(count: int = 1000):
+    """ Time require_auth against count excluded paths, half of them
+    wildcards, by linear scan and by the compiled PathMatcher
+    """
+    from api.v1.auth.auth import Auth, PathMatcher
+    excluded_paths = ["/api/v1/exact{}/".format(i) if i % 2 else
+                      "/api/v1/prefix{}/*".format(i) for i in range(count)]
+    matcher = PathMatcher(excluded_paths)
+    auth = Auth()
+    print("{:>24} {:>12} {:>12} {:>12}".format(
+        "path", "linear (us)", "list (us)", "matcher (us)"))
+    for path in ("/api/v1/exact1", "/api/v1/prefix0/users/1",
+                 "/api/v1/exact{}".format(count - 1),
+                 "/api/v1/prefix{}/x".format(count - 2), "/api/v1/users"):
+        times = [timeit.Timer(lambda: check(path, paths)).autorange()
+                 for check, paths in ((linear_require_auth, excluded_paths),
+                                      (auth.require_auth, excluded_paths),
+                                      (auth.require_auth, matcher))]
+        print("{:>24} {:>12.2f} {:>12.2f} {:>12.2f}".format(
+            path, *(total / number * 1e6 for number, total in times)))
+
+
+SESSIONS = {}
+
+
+def lookup_sessions(lookups: int) -> int:
+    """ Look random sessions of SESSIONS up in its store, returning the
+    number of wrong answers
+    """
+    store, sessions = SESSIONS["store"], SESSIONS["sessions"]
+    errors = 0
+    for session_id, user_id in random.choices(sessions, k=lookups):
+        if store.get(session_id) != user_id:
+            errors += 1
+    return errors
+
+
+def bench_sessions(count: int = 10000, processes: int = 4,
+                   lookups: int = 100000):
+    """ Load test each session store: count sessions, then lookups random
+    lookups in one process and in each of processes forked workers
+    (the memory store is copied into each worker, not shared)
+    """
+    from api.v1.auth.session_store import make_session_store
+    paths = {"memory": None, "sqlite": ".db_sessions_bench.sqlite",
+             "shm": "/dev/shm/hbtn_sessions_bench"}
+    fork = multiprocessing.get_context("fork")
+    print("{:>8} {:>12} {:>16} {:>16} {:>8}".format(
+        "store", "puts/s", "lookups/s (1)", "lookups/s ({})".format(
+            processes), "errors"))
+    for name, path in paths.items():
+        store = make_session_store(name, path, ttl=3600)
+        sessions = [(str(uuid.uuid4()), str(uuid.uuid4()))
+                    for i in range(count)]
+        start = time.perf_counter()
+        for session_id, user_id in sessions:
+            store.put(session_id, user_id)
+        puts = count / (time.perf_counter() - start)
+        SESSIONS.update(store=store, sessions=sessions)
+        start = time.perf_counter()
+        errors = lookup_sessions(lookups)
+        single = lookups / (time.perf_counter() - start)
+        start = time.perf_counter()
+        with fork.Pool(processes) as pool:
+            errors += sum(pool.map(lookup_sessions,
+                                   [lookups] * processes))
+        parallel = lookups * processes / (time.perf_counter() - start)
+        store.close()
+        for suffix in ("", "-wal", "-shm"):
+            if path is not None and os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        print("{:>8} {:>12.0f} {:>16.0f} {:>16.0f} {:>8}".format(
+            name, puts, single, parallel, errors))
+
+
+def bench_expiry(count: int = 100000, limit: int = 1000):
+    """ Expire count sessions of the memory store at once and sweep them
+    limit per tick, against one scan of every session
+    """
+    from api.v1.auth.session_store import MemoryStore
+    store = MemoryStore(ttl=1, sweep_interval=0, sweep_limit=limit)
+    for i in range(count):
+        store.put(str(uuid.uuid4()), "user")
+    time.sleep(2)
+    now = time.time()
+    start = time.perf_counter()
+    [session_id for session_id, entry in store._sessions.items()
+     if store.expired(store.deadline(entry[1], entry[2]), now)]
+    scan = time.perf_counter() - start
+    ticks = []
+    while len(store) > 0:
+        start = time.perf_counter()
+        store.record_evictions(store.sweep(limit))
+        ticks.append(time.perf_counter() - start)
+    print("full scan of {} sessions: {:.1f} ms".format(count, scan * 1e3))
+    print("{} sweeps of {}: {:.2f} ms max, {:.2f} ms mean per tick".format(
+        len(ticks), limit, max(ticks) * 1e3,
+        sum(ticks) / len(ticks) * 1e3))
+    print(store.metrics())
+
+
+BENCHMARKS = {
+    "search": bench_search,
+    "query": bench_query,
+    "load": bench_load,
+    "memory": bench_memory,
+    "formats": bench_formats,
+    "users": bench_users,
+    "auth": bench_auth,
+    "routes": bench_routes,
+    "sessions": bench_sessions,
+    "expiry": bench_expiry,
+}
+
+
+if __name__ == "__main__":
+    name = sys.argv[1] if len(sys.argv) > 1 else "search"
+    BENCHMARKS[name](*map(int, sys.argv[2:]))
@@ -1,21 +1,83 @@
 #!/usr/bin/env python3
 """ Base module
 """
+from bisect import bisect_left, bisect_right, insort
 from datetime import datetime
-from typing import TypeVar, List, Iterable
+from typing import TypeVar, List, Iterable, Iterator, Tuple
 from os import path
+from models.lock import RWLock
+from models.storage import FORMATS, TIMESTAMP_FORMAT, Journal
+import itertools
 import json
+import threading
 import uuid
 
 
-TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+FIELDS = {}
+INDEXES = {}
+SORTED_INDEXES = {}
+JOURNALS = {}
+LOCK = RWLock()
+MATERIALIZE_LOCK = threading.Lock()
+COMPACT_LOCK = threading.Lock()
+JSON_CACHE = {"hits": 0, "misses": 0}
+QUERY_BATCH = 1000
+VERSIONS = itertools.count()
+
+
+def json_cache_stats() -> dict:
+    """ Return the hits, misses and hit rate of the to_json cache
+    """
+    hits, misses = JSON_CACHE["hits"], JSON_CACHE["misses"]
+    return {"hits": hits, "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+
+
+def encode_json(value) -> bytes:
+    """ Return value encoded as compact JSON with sorted keys, the encoding
+    of every API response
+    """
+    return json.dumps(value, separators=(',', ':'), sort_keys=True).encode()
 
 
 class Base():
     """ Base class
+    - mutations are appended to .db_<class>.journal and folded into the
+      .db_<class>.<extension> snapshot once the journal holds more records
+      than max(__compact_every__, number of objects), so compacting stays
+      proportional to the mutations it saves replaying
+    - __storage__ picks the snapshot format: "json" or "binary"
+    - __fsync__ is "always", "batched" (every __fsync_batch__ records)
+      or "interval" (at most every __fsync_interval__ seconds)
+    - __commit_interval__ > 0 group-commits the journal every that many
+      seconds or every __commit_batch__ mutations, flush() forces it
+    - attributes listed in __indexes__ get a hash index used by search()
+    - attributes listed in __sorted_indexes__ get a sorted (value, ID)
+      list, built on first use, used by page() and query()
+    - loaded objects stay serialized dicts in DATA until get() or search()
+      first returns them
+    - attributes are stored in __slots__: subclasses list theirs too,
+      the ones in __transient__ are never serialized
+    - to_json() is cached, as a dict and as encoded bytes, until an
+      attribute is set
+    - LOCK guards DATA and the indexes: lookups share it, mutations hold it
+      alone while they update them and queue their journal record, then
+      write and sync the journal once it is released
     """
 
+    __slots__ = ('id', 'created_at', 'updated_at', '_cache', '_version')
+    __transient__ = ('_cache', '_version')
+    __indexes__ = ()
+    __sorted_indexes__ = ('id', 'created_at', 'updated_at')
+    __storage__ = "json"
+    __fsync__ = "always"
+    __fsync_batch__ = 100
+    __fsync_interval__ = 1.0
+    __commit_interval__ = 0
+    __commit_batch__ = 100
+    __compact_every__ = 1000
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
@@ -24,16 +86,49 @@ class Base():
             DATA[s_class] = {}
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
-        if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
-        else:
-            self.created_at = datetime.utcnow()
-        if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+        self.created_at = self.timestamp(kwargs.get('created_at'))
+        self.updated_at = self.timestamp(kwargs.get('updated_at'))
+
+    @staticmethod
+    def timestamp(value) -> datetime:
+        """ Return a timestamp given as datetime or TIMESTAMP_FORMAT string,
+        or the current time if None
+        """
+        if value is None:
+            return datetime.utcnow()
+        if type(value) is datetime:
+            return value
+        return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+    def __setattr__(self, name: str, value):
+        """ Set an attribute, keeping the indexes of stored objects in sync,
+        then give the object a new version: a cached JSON built from the
+        old value carries the old version, so it is never served
+        """
+        if name in ('_cache', '_version'):
+            super().__setattr__(name, value)
+            return
+        if (name not in self.__indexes__ and
+                name not in self.__sorted_indexes__) or \
+                DATA[self.__class__.__name__].get(
+                    getattr(self, 'id', None)) is not self:
+            super().__setattr__(name, value)
         else:
-            self.updated_at = datetime.utcnow()
+            with LOCK.write():
+                old_value = getattr(self, name, None)
+                super().__setattr__(name, value)
+                if DATA[self.__class__.__name__].get(self.id) is self:
+                    self.__class__.update_indexes(
+                        self.id, {name: old_value}, {name: value})
+        super().__setattr__('_version', next(VERSIONS))
+        super().__setattr__('_cache', None)
+
+    def is_stored(self) -> bool:
+        """ Tell whether this very object is the stored one for its ID
+        (one dict read, which needs no lock)
+        """
+        return DATA[self.__class__.__name__].get(
+            getattr(self, 'id', None)) is self
 
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
@@ -44,11 +139,57 @@ class Base():
             return False
         return (self.id == other.id)
 
+    @classmethod
+    def fields(cls) -> List[str]:
+        """ Return the slot names of the class, base class first
+        """
+        if FIELDS.get(cls) is None:
+            FIELDS[cls] = [name for klass in reversed(cls.__mro__)
+                           for name in klass.__dict__.get('__slots__', ())
+                           if name not in cls.__transient__]
+        return FIELDS[cls]
+
+    def serialize(self) -> dict:
+        """ Return every attribute of the object, timestamps as datetime
+        """
+        result = {key: getattr(self, key) for key in self.fields()
+                  if hasattr(self, key)}
+        result.update(getattr(self, '__dict__', {}))
+        return result
+
     def to_json(self, for_serialization: bool = False) -> dict:
         """ Convert the object a JSON dictionary
         """
+        if for_serialization:
+            return self.build_json(True)
+        return dict(self.cached_json()[0])
+
+    def json_bytes(self) -> bytes:
+        """ Return to_json() encoded as compact JSON with sorted keys
+        """
+        return self.cached_json()[1]
+
+    def cached_json(self) -> Tuple[dict, bytes, int]:
+        """ Return the public JSON dictionary, its encoding and the version
+        of the object they were built from, built on first use after the
+        last change of the object
+        """
+        version = self._version
+        cache = self._cache
+        if cache is not None and cache[2] == version:
+            JSON_CACHE["hits"] += 1
+            return cache
+        JSON_CACHE["misses"] += 1
+        result = self.build_json(False)
+        cache = (result, encode_json(result), version)
+        super().__setattr__('_cache', cache)
+        return cache
+
+    def build_json(self, for_serialization: bool) -> dict:
+        """ Build the JSON dictionary of the object
+        """
         result = {}
-        for key, value in self.__dict__.items():
+        for key, value in self.serialize().items():
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
@@ -57,56 +198,240 @@ class Base():
                 result[key] = value
         return result
 
+    @classmethod
+    def indexed_values(cls, obj: TypeVar('Base')) -> dict:
+        """ Return the values of the indexed attributes of an object
+        """
+        if obj is None:
+            return {}
+        attrs = cls.__indexes__ + cls.__sorted_indexes__
+        if type(obj) is dict:
+            return {attr: obj.get(attr) for attr in attrs}
+        return {attr: getattr(obj, attr, None) for attr in attrs}
+
+    @classmethod
+    def update_indexes(cls, obj_id: str, old_values: dict, new_values: dict):
+        """ Move an object ID from its old to its new indexed values
+        """
+        indexes = INDEXES.setdefault(cls.__name__, {})
+        sorted_indexes = SORTED_INDEXES.setdefault(cls.__name__, {})
+        for attr, value in old_values.items():
+            ids = indexes.get(attr, {}).get(value)
+            if ids is not None:
+                ids.discard(obj_id)
+                if len(ids) == 0:
+                    del indexes[attr][value]
+            entries = sorted_indexes.get(attr)
+            if entries is not None and value is not None:
+                entry = (cls.sort_key(value), obj_id)
+                i = bisect_left(entries, entry)
+                if i < len(entries) and entries[i] == entry:
+                    del entries[i]
+        for attr, value in new_values.items():
+            if attr in cls.__indexes__:
+                indexes.setdefault(attr, {}).setdefault(
+                    value, set()).add(obj_id)
+            entries = sorted_indexes.get(attr)
+            if entries is not None and value is not None:
+                insort(entries, (cls.sort_key(value), obj_id))
+
+    @staticmethod
+    def sort_key(value):
+        """ Return the value an attribute is sorted by: timestamps become
+        TIMESTAMP_FORMAT strings, which sort like the dates and match the
+        serialized dicts
+        """
+        if type(value) is datetime:
+            return value.strftime(TIMESTAMP_FORMAT)
+        return value
+
+    @classmethod
+    def sorted_index(cls, attr: str) -> list:
+        """ Return the sorted (value, ID) list of an attribute, built on
+        first use then kept in sync by update_indexes (the caller holds LOCK)
+        """
+        sorted_indexes = SORTED_INDEXES.setdefault(cls.__name__, {})
+        entries = sorted_indexes.get(attr)
+        if entries is None:
+            with MATERIALIZE_LOCK:
+                entries = sorted_indexes.get(attr)
+                if entries is None:
+                    entries = []
+                    for obj_id, obj in DATA[cls.__name__].items():
+                        value = obj.get(attr) if type(obj) is dict \
+                            else getattr(obj, attr, None)
+                        if value is not None:
+                            entries.append((cls.sort_key(value), obj_id))
+                    entries.sort()
+                    sorted_indexes[attr] = entries
+        return entries
+
+    @classmethod
+    def store(cls, obj):
+        """ Put an object, or its serialized dict, in memory, replacing
+        any object with its ID
+        """
+        obj_id = obj["id"] if type(obj) is dict else obj.id
+        with LOCK.write():
+            objs = DATA[cls.__name__]
+            previous = objs.get(obj_id)
+            objs[obj_id] = obj
+            if previous is not obj:
+                cls.update_indexes(obj_id, cls.indexed_values(previous),
+                                   cls.indexed_values(obj))
+
+    @classmethod
+    def materialize(cls, obj_id: str) -> TypeVar('Base'):
+        """ Return one object by ID, building it from its serialized dict
+        on first access (the caller holds LOCK)
+        """
+        objs = DATA[cls.__name__]
+        obj = objs.get(obj_id)
+        if type(obj) is dict:
+            with MATERIALIZE_LOCK:
+                obj = objs.get(obj_id)
+                if type(obj) is dict:
+                    obj = cls(**obj)
+                    objs[obj_id] = obj
+        return obj
+
+    @classmethod
+    def discard(cls, obj_id: str):
+        """ Drop an object from memory
+        """
+        with LOCK.write():
+            obj = DATA[cls.__name__].pop(obj_id, None)
+            cls.update_indexes(obj_id, cls.indexed_values(obj), {})
+
+    @classmethod
+    def journal(cls) -> Journal:
+        """ Return the journal of the class
+        """
+        s_class = cls.__name__
+        if JOURNALS.get(s_class) is None:
+            JOURNALS[s_class] = Journal(
+                ".db_{}.journal".format(s_class), cls.__fsync__,
+                cls.__fsync_batch__, cls.__fsync_interval__,
+                cls.__commit_interval__, cls.__commit_batch__)
+        return JOURNALS[s_class]
+
+    @classmethod
+    def flush(cls):
+        """ Write the mutations waiting for the next group commit
+        """
+        cls.journal().flush()
+
+    @classmethod
+    def snapshot_path(cls) -> str:
+        """ Return the snapshot file of the class
+        """
+        return ".db_{}.{}".format(
+            cls.__name__, FORMATS[cls.__storage__].extension)
+
     @classmethod
     def load_from_file(cls):
-        """ Load all objects from file
+        """ Load all objects from file: the snapshot then the journal
+        Both are streamed and objects are only built on first access
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
+        file_path = cls.snapshot_path()
+        with LOCK.write():
+            DATA[s_class] = {}
+            INDEXES[s_class] = {}
+            SORTED_INDEXES[s_class] = {}
+            if path.exists(file_path):
+                storage = FORMATS[cls.__storage__]
+                for obj_id, obj_json in storage.load(file_path):
+                    cls.store(obj_json)
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+            for record in cls.journal().replay():
+                if record["op"] == "put":
+                    cls.store(record["obj"])
+                else:
+                    cls.discard(record["id"])
 
     @classmethod
     def save_to_file(cls):
-        """ Save all objects to file
+        """ Save all objects to file and empty the journal
+        """
+        with COMPACT_LOCK:
+            cls.write_snapshot()
+
+    @classmethod
+    def write_snapshot(cls):
+        """ Copy the objects and rotate the journal under LOCK, then write
+        the snapshot and drop the rotated journal once LOCK is released
+        (the caller holds COMPACT_LOCK)
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        journal = cls.journal()
+        with LOCK.write():
+            records = [(obj_id, obj if type(obj) is dict
+                        else obj.serialize())
+                       for obj_id, obj in DATA[s_class].items()]
+            journal.rotate()
+        FORMATS[cls.__storage__].dump(cls.snapshot_path(), records)
+        journal.drop_rotated()
+
+    @classmethod
+    def compact(cls):
+        """ Fold the journal into the snapshot if it holds more records
+        than max(__compact_every__, number of objects), unless another
+        thread is already doing it
+        """
+        threshold = max(cls.__compact_every__, len(DATA[cls.__name__]))
+        if cls.journal().records <= threshold:
+            return
+        if not COMPACT_LOCK.acquire(blocking=False):
+            return
+        try:
+            cls.write_snapshot()
+        finally:
+            COMPACT_LOCK.release()
+
+    @classmethod
+    def append_to_journal(cls, record: dict):
+        """ Queue one mutation in the journal, in the order of the changes
+        to DATA (the caller holds LOCK)
+        """
+        cls.journal().enqueue(record)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def commit_journal(cls):
+        """ Write the queued mutations, then compact the journal if it is
+        long (the caller does not hold LOCK)
+        """
+        cls.journal().commit()
+        cls.compact()
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        with LOCK.write():
+            self.__class__.store(self)
+            self.__class__.append_to_journal(
+                {"op": "put", "id": self.id, "obj": self.to_json(True)})
+        self.__class__.commit_journal()
 
     def remove(self):
         """ Remove object
         """
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        with LOCK.write():
+            if DATA[s_class].get(self.id) is not None:
+                self.__class__.discard(self.id)
+                self.__class__.append_to_journal(
+                    {"op": "del", "id": self.id})
+        self.__class__.commit_journal()
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
         s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        with LOCK.read():
+            return len(DATA[s_class].keys())
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -118,20 +443,106 @@ class Base():
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
-        s_class = cls.__name__
-        return DATA[s_class].get(id)
+        with LOCK.read():
+            return cls.materialize(id)
+
+    @classmethod
+    def page(cls, after: str = None, offset: int = 0,
+             limit: int = None) -> List[TypeVar('Base')]:
+        """ Return up to limit objects in ID order, starting after the ID
+        `after` (a cursor) and skipping offset of them
+        """
+        with LOCK.read():
+            entries = cls.sorted_index('id')
+            start = offset
+            if after is not None:
+                start += bisect_right(entries, (after, after))
+            end = len(entries) if limit is None else start + limit
+            return [cls.materialize(obj_id)
+                    for value, obj_id in entries[start:end]]
+
+    @classmethod
+    def query(cls, attr: str, start=None, end=None, prefix: str = None,
+              limit: int = None,
+              reverse: bool = False) -> Iterator[TypeVar('Base')]:
+        """ Yield the objects whose sorted attribute is in [start, end)
+        and starts with prefix, in attribute order or reversed, at most
+        limit of them
+        Objects are looked up QUERY_BATCH at a time: no lock is held while
+        the caller consumes them, and later batches see concurrent changes
+        """
+        if attr not in cls.__sorted_indexes__:
+            raise ValueError("{} has no sorted index on {}".format(
+                cls.__name__, attr))
+        start, end = cls.sort_key(start), cls.sort_key(end)
+        if prefix:
+            after_prefix = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            if start is None or start < prefix:
+                start = prefix
+            if end is None or end > after_prefix:
+                end = after_prefix
+
+        def batches(limit: int) -> Iterator[TypeVar('Base')]:
+            """ Yield the matching objects batch by batch
+            """
+            last = None
+            while limit is None or limit > 0:
+                size = QUERY_BATCH if limit is None \
+                    else min(limit, QUERY_BATCH)
+                with LOCK.read():
+                    entries = cls.sorted_index(attr)
+                    lo = 0 if start is None else bisect_left(entries, (start,))
+                    hi = len(entries) if end is None \
+                        else bisect_left(entries, (end,))
+                    if not reverse:
+                        if last is not None:
+                            lo = max(lo, bisect_right(entries, last))
+                        batch = entries[lo:min(hi, lo + size)]
+                    else:
+                        if last is not None:
+                            hi = min(hi, bisect_left(entries, last))
+                        batch = entries[max(lo, hi - size):hi][::-1]
+                    objs = [cls.materialize(entry[1]) for entry in batch]
+                yield from objs
+                if len(batch) < size:
+                    return
+                last = batch[-1]
+                if limit is not None:
+                    limit -= len(batch)
+
+        return batches(limit)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
+        Indexed attributes are looked up in their index, the others are
+        compared on each candidate
         """
         s_class = cls.__name__
-        def _search(obj):
-            if len(attributes) == 0:
-                return True
+        with LOCK.read():
+            objs = DATA[s_class]
+            indexes = INDEXES.get(s_class, {})
+            candidates = None
             for k, v in attributes.items():
+                if k in cls.__indexes__:
+                    ids = indexes.get(k, {}).get(v, set())
+                    candidates = ids if candidates is None \
+                        else candidates & ids
+            if candidates is not None:
+                candidates = [cls.materialize(obj_id)
+                              for obj_id in candidates]
+            else:
+                candidates = [obj if type(obj) is not dict
+                              else cls.materialize(obj_id)
+                              for obj_id, obj in objs.items()]
+
+        scanned = [(k, v) for k, v in attributes.items()
+                   if k not in cls.__indexes__]
+
+        def _search(obj):
+            for k, v in scanned:
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        return list(filter(_search, candidates))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+""" Lock module
+"""
+from contextlib import contextmanager
+import threading
+
+
+class RWLock():
+    """ Reader-writer lock
+    - any number of readers share it, a writer holds it alone
+    - waiting writers go before new readers, so writes are not starved
+    - the writing thread may take it again, to read or to write
+    """
+
+    def __init__(self):
+        """ Initialize a free lock
+        """
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._depth = 0
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        """ Wait until no writer holds or waits for the lock, then share it
+        """
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._depth += 1
+                return
+            while self._writer is not None or self._waiting_writers > 0:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        """ Release a shared hold
+        """
+        with self._cond:
+            if self._writer == threading.get_ident():
+                self._depth -= 1
+                return
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        """ Wait until nobody else holds the lock, then hold it alone
+        """
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._depth += 1
+                return
+            self._waiting_writers += 1
+            while self._writer is not None or self._readers > 0:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = me
+            self._depth = 1
+
+    def release_write(self):
+        """ Release an exclusive hold
+        """
+        with self._cond:
+            self._depth -= 1
+            if self._depth == 0:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        """ Context manager holding the lock shared
+        """
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        """ Context manager holding the lock alone
+        """
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+""" Storage module
+"""
+from datetime import datetime, timedelta
+from os import path
+from typing import Iterator, List, Tuple
+import atexit
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+TIMESTAMP_FIELDS = ("created_at", "updated_at")
+EPOCH = datetime(1970, 1, 1)
+FSYNC_POLICIES = ("always", "batched", "interval")
+CHUNK_SIZE = 1 << 16
+ITEM_SEPARATOR = re.compile(r'[\s,]*')
+KEY_SEPARATOR = re.compile(r'\s*:\s*')
+
+
+def iter_json_object(
+        file_path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple]:
+    """ Yield the (key, value) pairs of a file holding one JSON object
+    The file is read chunk_size characters at a time, so memory stays
+    bounded by the largest value instead of the whole file
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r') as f:
+        buf = f.read(chunk_size).lstrip()
+        if len(buf) == 0:
+            return
+        if buf[0] != '{':
+            raise ValueError("Not a JSON object: {}".format(file_path))
+        pos = 1
+        while True:
+            pos = ITEM_SEPARATOR.match(buf, pos).end()
+            try:
+                if pos < len(buf) and buf[pos] == '}':
+                    return
+                key, end = decoder.raw_decode(buf, pos)
+                separator = KEY_SEPARATOR.match(buf, end)
+                if separator is None:
+                    raise ValueError("Incomplete item")
+                value, end = decoder.raw_decode(buf, separator.end())
+            except ValueError:
+                chunk = f.read(chunk_size)
+                if len(chunk) == 0:
+                    raise ValueError("Truncated JSON object: {}".format(
+                        file_path))
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            pos = end
+            yield key, value
+
+
+def write_atomic(file_path: str, content):
+    """ Replace a file with new str or bytes content, never leaving it
+    half written
+    """
+    tmp_path = "{}.tmp".format(file_path)
+    with open(tmp_path, 'wb' if type(content) is bytes else 'w') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+
+def format_timestamp(value) -> str:
+    """ JSON encoder hook writing datetime values as TIMESTAMP_FORMAT
+    """
+    if type(value) is datetime:
+        return value.strftime(TIMESTAMP_FORMAT)
+    raise TypeError("{} is not JSON serializable".format(type(value)))
+
+
+class JsonFormat():
+    """ Snapshot stored as one JSON object mapping IDs to objects
+    """
+
+    extension = "json"
+
+    def load(self, file_path: str) -> Iterator[Tuple[str, dict]]:
+        """ Yield the (ID, serialized object) pairs of a snapshot
+        """
+        return iter_json_object(file_path)
+
+    def dump(self, file_path: str, records: List[Tuple[str, dict]]):
+        """ Write a snapshot of (ID, serialized object) pairs
+        """
+        write_atomic(file_path, json.dumps(dict(records),
+                                           default=format_timestamp))
+
+
+class BinaryFormat():
+    """ Snapshot stored as length-prefixed binary records
+    - header: b"BDB1", then the length-prefixed JSON list of field names
+    - record: its length, then for each field a type tag and its value,
+      timestamps being epoch seconds
+    Loading reads the file through mmap without parsing any text
+    """
+
+    extension = "bin"
+    MAGIC = b"BDB1"
+    NONE, STRING, TIMESTAMP, JSON = range(4)
+    LENGTH = struct.Struct(">I")
+    SECONDS = struct.Struct(">q")
+
+    def load(self, file_path: str) -> Iterator[Tuple[str, dict]]:
+        """ Yield the (ID, serialized object) pairs of a snapshot
+        """
+        length, seconds = self.LENGTH, self.SECONDS
+        with open(file_path, 'rb') as f:
+            if path.getsize(file_path) == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data[:4] != self.MAGIC:
+                    raise ValueError("Not a binary snapshot: {}".format(
+                        file_path))
+                size = length.unpack_from(data, 4)[0]
+                fields = json.loads(data[8:8 + size].decode())
+                pos = 8 + size
+                while pos < len(data):
+                    end = pos + 4 + length.unpack_from(data, pos)[0]
+                    pos += 4
+                    record = {}
+                    for field in fields:
+                        tag = data[pos]
+                        pos += 1
+                        if tag == self.NONE:
+                            record[field] = None
+                        elif tag == self.TIMESTAMP:
+                            record[field] = EPOCH + timedelta(
+                                seconds=seconds.unpack_from(data, pos)[0])
+                            pos += 8
+                        else:
+                            size = length.unpack_from(data, pos)[0]
+                            text = data[pos + 4:pos + 4 + size].decode()
+                            pos += 4 + size
+                            record[field] = text if tag == self.STRING \
+                                else json.loads(text)
+                    pos = end
+                    yield record["id"], record
+
+    def dump(self, file_path: str, records: List[Tuple[str, dict]]):
+        """ Write a snapshot of (ID, serialized object) pairs
+        """
+        fields = {}
+        for obj_id, record in records:
+            for field in record:
+                fields[field] = True
+        fields = list(fields)
+        header = json.dumps(fields).encode()
+        chunks = [self.MAGIC, self.LENGTH.pack(len(header)), header]
+        for obj_id, record in records:
+            payload = b"".join(self.encode(field, record.get(field))
+                               for field in fields)
+            chunks.append(self.LENGTH.pack(len(payload)))
+            chunks.append(payload)
+        write_atomic(file_path, b"".join(chunks))
+
+    def encode(self, field: str, value) -> bytes:
+        """ Encode one value with its type tag
+        """
+        if value is None:
+            return bytes((self.NONE,))
+        if field in TIMESTAMP_FIELDS and type(value) is str:
+            value = datetime.strptime(value, TIMESTAMP_FORMAT)
+        if type(value) is datetime:
+            return bytes((self.TIMESTAMP,)) + self.SECONDS.pack(
+                (value - EPOCH) // timedelta(seconds=1))
+        if type(value) is str:
+            tag, text = self.STRING, value
+        else:
+            tag, text = self.JSON, json.dumps(value)
+        text = text.encode()
+        return bytes((tag,)) + self.LENGTH.pack(len(text)) + text
+
+
+FORMATS = {
+    "json": JsonFormat(),
+    "binary": BinaryFormat(),
+}
+
+
+def format_of(file_path: str):
+    """ Return the snapshot format matching the extension of a file
+    """
+    for storage_format in FORMATS.values():
+        if file_path.endswith("." + storage_format.extension):
+            return storage_format
+    raise ValueError("Unknown snapshot format: {}".format(file_path))
+
+
+def convert(src_path: str, dst_path: str):
+    """ Convert a snapshot between formats, chosen by file extension
+    """
+    records = list(format_of(src_path).load(src_path))
+    format_of(dst_path).dump(dst_path, records)
+
+
+class Journal():
+    """ Append-only log of put and delete records
+    - fsync: "always" after each write, "batched" every `batch` records or
+      "interval" at most every `interval` seconds, a timer syncing the
+      last records once writes stop
+    - commit_interval: 0 writes each record as it comes, otherwise records
+      are group-committed by a background thread every commit_interval
+      seconds, or as soon as commit_batch of them are pending; a crash
+      loses at most that window
+    """
+
+    def __init__(self, file_path: str, fsync: str = "always",
+                 batch: int = 100, interval: float = 1.0,
+                 commit_interval: float = 0, commit_batch: int = 100):
+        """ Initialize a Journal writing to file_path
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError("Unknown fsync policy: {}".format(fsync))
+        self.file_path = file_path
+        self.fsync = fsync
+        self.batch = batch
+        self.interval = interval
+        self.commit_interval = commit_interval
+        self.commit_batch = commit_batch
+        self.records = 0
+        self.writes = 0
+        self._pending = []
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+        self._file = None
+        self._lock = threading.RLock()
+        self._flusher = None
+        self._syncer = None
+
+    @property
+    def rotated_path(self) -> str:
+        """ Return the file holding the records of a snapshot in progress
+        """
+        return "{}.old".format(self.file_path)
+
+    def replay(self) -> Iterator[dict]:
+        """ Yield every record of the journal in order, the rotated ones
+        first
+        """
+        self.close()
+        self.records = 0
+        for file_path in (self.rotated_path, self.file_path):
+            yield from self._replay_file(file_path)
+
+    def _replay_file(self, file_path: str) -> Iterator[dict]:
+        """ Yield every record of one journal file in order
+        A torn or corrupt tail left by a crash is cut off
+        """
+        if not path.exists(file_path):
+            return
+        valid = 0
+        with open(file_path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("Torn record")
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                valid += len(line)
+                self.records += 1
+                yield record
+        if valid < path.getsize(file_path):
+            os.truncate(file_path, valid)
+
+    def append(self, record: dict):
+        """ Append one record, now or with the next group commit
+        """
+        self.enqueue(record)
+        self.commit()
+
+    def enqueue(self, record: dict):
+        """ Queue one record after the ones queued before it, without
+        writing anything: commit() writes it
+        """
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self.records += 1
+            self._pending.append(line)
+
+    def commit(self):
+        """ Write the queued records in one go, or leave them to the group
+        commit
+        """
+        if self.commit_interval <= 0:
+            self.flush()
+            return
+        with self._lock:
+            if len(self._pending) >= self.commit_batch:
+                self.flush()
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run_flusher,
+                                                 daemon=True)
+                self._flusher.start()
+                atexit.register(self.close)
+
+    def flush(self):
+        """ Write the pending records in one go
+        """
+        with self._lock:
+            if len(self._pending) > 0:
+                self._write(self._pending)
+                self._pending = []
+
+    def sync(self):
+        """ Force the written records to disk
+        """
+        with self._lock:
+            if self._file is not None and self._unsynced > 0:
+                os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._synced_at = time.monotonic()
+
+    def rotate(self):
+        """ Move the records written so far aside, to rotated_path, while
+        a snapshot holding them is written; new records start a new file
+        A rotated file left by an unfinished snapshot is kept and extended
+        """
+        with self._lock:
+            self.close()
+            if path.exists(self.file_path):
+                if path.exists(self.rotated_path):
+                    with open(self.file_path, 'rb') as src, \
+                            open(self.rotated_path, 'ab') as dst:
+                        dst.write(src.read())
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(self.file_path)
+                else:
+                    os.replace(self.file_path, self.rotated_path)
+            self.records = 0
+
+    def drop_rotated(self):
+        """ Delete the rotated records once the snapshot holds them
+        """
+        with self._lock:
+            if path.exists(self.rotated_path):
+                os.remove(self.rotated_path)
+
+    def close(self):
+        """ Write the pending records, sync and close the journal file
+        """
+        with self._lock:
+            self.flush()
+            if self._syncer is not None:
+                self._syncer.cancel()
+                self._syncer = None
+            if self._file is not None:
+                self.sync()
+                self._file.close()
+                self._file = None
+
+    def _write(self, lines: List[str]):
+        """ Write records to the file, syncing them as the policy says
+        """
+        if self._file is None:
+            self._file = open(self.file_path, 'a')
+        self._file.write("".join(lines))
+        self._file.flush()
+        self.writes += 1
+        self._unsynced += len(lines)
+        if self.fsync == "always" or \
+                (self.fsync == "batched" and self._unsynced >= self.batch) or \
+                (self.fsync == "interval" and
+                 time.monotonic() - self._synced_at >= self.interval):
+            self.sync()
+        elif self.fsync == "interval" and self._syncer is None:
+            self._syncer = threading.Timer(
+                self._synced_at + self.interval - time.monotonic(),
+                self._run_syncer)
+            self._syncer.daemon = True
+            self._syncer.start()
+
+    def _run_syncer(self):
+        """ Sync the records written since the last sync, once interval
+        has elapsed without a write doing it
+        """
+        with self._lock:
+            self._syncer = None
+            self.sync()
+
+    def _run_flusher(self):
+        """ Group-commit the pending records every commit_interval seconds
+        """
+        while True:
+            time.sleep(self.commit_interval)
+            self.flush()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python3 -m models.storage SOURCE DESTINATION")
+    convert(sys.argv[1], sys.argv[2])
@@ -9,6 +9,10 @@ class User(Base):
     """ User class
     """
 
+    __slots__ = ('email', '_password', 'first_name', 'last_name')
+    __indexes__ = ('email',)
+    __sorted_indexes__ = Base.__sorted_indexes__ + ('email',)
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
         """
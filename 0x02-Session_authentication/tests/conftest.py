@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+""" Fixtures of the tests
+"""
+from typing import Callable
+import base64
+import pytest
+import api.v1.app as app_module
+from api.v1.auth.basic_auth import BasicAuth
+import models.base as base
+from models.user import User
+
+
+class FakeClock():
+    """ Clock standing in for the time module, moved by hand
+    """
+
+    def __init__(self, now: float = 0.0):
+        """ Initialize the clock at now
+        """
+        self.now = now
+
+    def time(self) -> float:
+        """ Return the current fake time
+        """
+        return self.now
+
+    def monotonic(self) -> float:
+        """ Return the current fake time
+        """
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    """ A fake clock at 0, to patch over the time module of a module
+    """
+    return FakeClock()
+
+
+@pytest.fixture
+def users(tmp_path, monkeypatch):
+    """ Give the User class an empty store kept in a temporary directory
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(base, "JOURNALS", {})
+    User.load_from_file()
+    yield User
+    User.journal().close()
+
+
+@pytest.fixture
+def make_user(users) -> Callable[..., User]:
+    """ Factory creating and saving users in the empty store
+    """
+    def make(email: str, password: str = "pwd") -> User:
+        """ Create and save one user
+        """
+        user = User(email=email)
+        user.password = password
+        user.save()
+        return user
+    return make
+
+
+@pytest.fixture
+def basic() -> Callable[[str, str], str]:
+    """ Function returning the Basic Authorization header of credentials
+    """
+    def header(email: str, password: str) -> str:
+        """ Return the Basic Authorization header of credentials
+        """
+        return "Basic " + base64.b64encode(
+            "{}:{}".format(email, password).encode()).decode()
+    return header
+
+
+@pytest.fixture
+def client(users, monkeypatch):
+    """ Test client of the API authenticating with a fresh BasicAuth
+    """
+    auth = BasicAuth()
+    monkeypatch.setattr(app_module, "auth", auth)
+    app_module.app.config["TESTING"] = True
+    with app_module.app.test_client() as client:
+        client.auth = auth
+        yield client
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+""" Tests of the authentication of API requests
+"""
+
+
+def test_timings_only_for_authenticated_requests(client, make_user, basic):
+    """ Failed attempts get no Server-Timing header, whether their email
+    has an account or not
+    """
+    make_user("a@b.c", "pwd")
+    for email in ("a@b.c", "nobody@b.c"):
+        response = client.get("/api/v1/users",
+                              headers={"Authorization": basic(email, "bad")})
+        assert response.status_code == 403
+        assert "Server-Timing" not in response.headers
+    response = client.get("/api/v1/users",
+                          headers={"Authorization": basic("a@b.c", "pwd")})
+    assert response.status_code == 200
+    stages = [metric.split(";")[0]
+              for metric in response.headers["Server-Timing"].split(", ")]
+    assert stages == ["auth-extract", "auth-cache", "auth-decode",
+                      "auth-lookup", "auth-verify"]
+    timing = client.auth.timing_metrics()
+    assert timing["cache"]["count"] == 3
+    assert timing["verify"]["count"] == 2
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+""" Tests of the cache of verified Basic-auth credentials
+"""
+import pytest
+import api.v1.auth.credential_cache as credential_cache
+from api.v1.auth.credential_cache import CredentialCache
+from models.user import User
+
+
+@pytest.fixture
+def cached(client, make_user, basic):
+    """ A user whose header is in the cache, with the header
+    """
+    user = make_user("bob@hbtn.io", "pwd")
+    header = basic("bob@hbtn.io", "pwd")
+    assert status(client, user, header) == 200
+    assert client.auth.credential_cache.metrics()["size"] == 1
+    return user, header
+
+
+def status(client, user: User, header: str) -> int:
+    """ Return the status of GET /api/v1/users/<id> with a header
+    """
+    return client.get("/api/v1/users/{}".format(user.id),
+                      headers={"Authorization": header}).status_code
+
+
+def test_cached_header_is_reused(client, cached):
+    """ The second request with a header hits the cache
+    """
+    user, header = cached
+    assert status(client, user, header) == 200
+    assert client.auth.credential_cache.metrics()["hits"] == 1
+
+
+def test_password_change_rejects_cached_header(client, cached, basic):
+    """ Changing the password makes the cached header fail
+    """
+    user, header = cached
+    user.password = "new"
+    user.save()
+    assert status(client, user, header) == 403
+    assert status(client, user, basic("bob@hbtn.io", "new")) == 200
+
+
+def test_email_change_rejects_cached_header(client, cached):
+    """ Changing the email makes the cached header fail
+    """
+    user, header = cached
+    user.email = "robert@hbtn.io"
+    user.save()
+    assert status(client, user, header) == 403
+
+
+def test_remove_rejects_cached_header(client, cached, make_user):
+    """ Removing the user makes the cached header fail
+    """
+    user, header = cached
+    other = make_user("alice@hbtn.io", "pwd")
+    user.remove()
+    assert status(client, other, header) == 403
+
+
+def test_reload_rejects_cached_header(client, cached):
+    """ Reloading the store after the password changed on disk makes the
+    cached header fail
+    """
+    user, header = cached
+    record = user.to_json(True)
+    record["_password"] = "0" * 64
+    User.journal().append({"op": "put", "id": user.id, "obj": record})
+    User.load_from_file()
+    assert status(client, user, header) == 403
+
+
+def test_entries_expire_after_ttl(make_user, clock, monkeypatch):
+    """ An entry is a miss once its TTL has elapsed
+    """
+    monkeypatch.setattr(credential_cache, "time", clock)
+    cache = CredentialCache(max_size=10, ttl=300)
+    user = make_user("bob@hbtn.io", "pwd")
+    cache.put("header", user)
+    clock.now = 299
+    assert cache.get("header") is user
+    clock.now = 300
+    assert cache.get("header") is None
+    assert cache.metrics()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(make_user):
+    """ At max_size the least recently used header is dropped
+    """
+    cache = CredentialCache(max_size=2, ttl=300)
+    user = make_user("bob@hbtn.io", "pwd")
+    cache.put("first", user)
+    cache.put("second", user)
+    assert cache.get("first") is user
+    cache.put("third", user)
+    assert cache.get("second") is None
+    assert cache.get("first") is user
+    assert cache.get("third") is user
+    assert cache.metrics()["size"] == 2
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+""" Tests of the model store
+"""
+import os
+import threading
+import time
+from models.base import DATA, INDEXES
+from models.storage import Journal
+from models.user import User
+
+
+def user_email(i: int) -> str:
+    """ Return the email of the i-th test user
+    """
+    return "user{}@hbtn.io".format(i)
+
+
+def test_compaction_scales_with_live_objects(make_user, monkeypatch):
+    """ The journal is only compacted once it outgrows the live objects
+    """
+    monkeypatch.setattr(User, "__compact_every__", 10)
+    created = [make_user(user_email(i)) for i in range(30)]
+    assert User.journal().records == 30
+    assert not os.path.exists(User.snapshot_path())
+    for user in created:
+        user.first_name = "Bob"
+        user.save()
+    assert os.path.exists(User.snapshot_path())
+    assert User.journal().records < 30
+    assert not os.path.exists(User.journal().rotated_path)
+
+
+def test_reload_after_interrupted_compaction(make_user):
+    """ Records rotated for a snapshot that was never written are replayed
+    """
+    created = [make_user(user_email(i)) for i in range(5)]
+    User.journal().rotate()
+    created[0].remove()
+    created[1].first_name = "Bob"
+    created[1].save()
+    User.journal().close()
+    User.load_from_file()
+    assert User.count() == 4
+    assert User.get(created[0].id) is None
+    assert User.get(created[1].id).first_name == "Bob"
+    assert User.search({"email": "user4@hbtn.io"})[0].id == created[4].id
+
+
+def test_parallel_mutations_stay_consistent(users, monkeypatch):
+    """ Parallel create, search and delete threads leave the store, its
+    email index and the journal in agreement
+    """
+    monkeypatch.setattr(User, "__fsync__", "batched")
+    monkeypatch.setattr(User, "__compact_every__", 500)
+    errors = []
+
+    def worker(number: int):
+        """ Create, look up and delete users
+        """
+        for i in range(300):
+            user = User(email="stress{}-{}@hbtn.io".format(number, i))
+            user.save()
+            found = User.search({'email': user.email})
+            if len(found) != 1 or found[0].id != user.id:
+                errors.append(user.email)
+            if i % 2 == 0:
+                user.remove()
+            User.count()
+
+    workers = [threading.Thread(target=worker, args=(number,))
+               for number in range(8)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    assert errors == []
+    ids = set(DATA['User'])
+    assert len(ids) == 8 * 150
+    assert ids == set().union(*INDEXES['User']['email'].values())
+    User.load_from_file()
+    assert set(DATA['User']) == ids
+
+
+def test_interval_fsync_runs_after_writes_stop(tmp_path, monkeypatch):
+    """ The "interval" policy syncs the last records even if no write
+    follows them
+    """
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: synced.append(fsync(fd)))
+    journal = Journal(str(tmp_path / "journal"), "interval", interval=0.05)
+    journal.append({"op": "del", "id": "1"})
+    journal.append({"op": "del", "id": "2"})
+    assert synced == []
+    time.sleep(0.2)
+    assert len(synced) == 1
+    journal.close()
+    assert len(synced) == 1
+
+
+def test_json_built_before_a_change_is_not_served(make_user, monkeypatch):
+    """ A JSON build that read a value changed before it was stored is
+    dropped on the next read
+    """
+    user = make_user(user_email(0))
+    build_json = User.build_json
+
+    def racing_build_json(self, for_serialization: bool) -> dict:
+        """ Build the JSON, then change the object as another thread would
+        """
+        result = build_json(self, for_serialization)
+        monkeypatch.setattr(User, "build_json", build_json)
+        self.first_name = "Bob"
+        return result
+
+    monkeypatch.setattr(User, "build_json", racing_build_json)
+    assert user.to_json()["first_name"] is None
+    assert user.to_json()["first_name"] == "Bob"
+    assert b'"first_name":"Bob"' in user.json_bytes()
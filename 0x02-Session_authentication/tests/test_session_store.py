@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+""" Tests of the session stores
+"""
+import pytest
+import api.v1.auth.session_store as session_store
+from api.v1.auth.session_store import (MemoryStore, SessionStore,
+                                       SharedMemoryStore, TimerWheel)
+
+
+def test_wheel_far_keys_do_not_stall_due_keys():
+    """ Keys whole revolutions away must not hold the wheel on a tick
+    """
+    wheel = TimerWheel(tick=1.0, slots=4)
+    wheel.next = 0
+    deadlines = {"far{}".format(i): 100.0 for i in range(10)}
+    deadlines["due"] = 1.5
+    for key, deadline in deadlines.items():
+        wheel.schedule(key, deadline)
+    expired = []
+    for i in range(10):
+        expired += wheel.expire(3.0, 5, deadlines.get)
+    assert expired == ["due"]
+    assert wheel.next == 3
+
+
+def test_wheel_expires_far_keys_on_their_revolution():
+    """ A key several revolutions away expires on its tick, not before
+    """
+    wheel = TimerWheel(tick=1.0, slots=4)
+    wheel.next = 0
+    deadlines = {"far": 10.5}
+    wheel.schedule("far", 10.5)
+    assert wheel.expire(10.0, 100, deadlines.get) == []
+    assert wheel.expire(11.0, 100, deadlines.get) == ["far"]
+
+
+def test_memory_store_keeps_up_with_long_ttl(clock, monkeypatch):
+    """ With a TTL longer than a revolution and a small sweep limit, the
+    sweeper keeps the store at the live sessions
+    """
+    monkeypatch.setattr(session_store, "time", clock)
+    store = MemoryStore(ttl=500, sweep_interval=0, sweep_limit=100)
+    store._wheel = TimerWheel(tick=1.0, slots=64)
+    logins = 0
+    for second in range(1500):
+        clock.now = float(second)
+        for i in range(6):
+            store.put("s{}".format(logins), "user")
+            logins += 1
+        store.sweep(store.sweep_limit)
+    assert store._wheel.next >= 1499 - 1
+    assert len(store) <= 6 * 502
+
+
+def test_shared_memory_store_reuses_deleted_slots(tmp_path):
+    """ Deleting leaves no tombstones: a table churned many times its size
+    still finds every session and reports misses without a full scan
+    """
+    store = SharedMemoryStore(str(tmp_path / "sessions"), sweep_interval=0,
+                              slots=64)
+    try:
+        live = {}
+        for i in range(2000):
+            session_id = "s{}".format(i)
+            store.put(session_id, "u{}".format(i))
+            live[session_id] = "u{}".format(i)
+            if len(live) > 40:
+                oldest = next(iter(live))
+                assert store.delete(oldest)
+                del live[oldest]
+        states = [store._data[store.offset(i)] for i in range(store.slots)]
+        assert SharedMemoryStore.DELETED not in states
+        assert states.count(SharedMemoryStore.USED) == len(live)
+        for session_id, user_id in live.items():
+            assert store.get(session_id) == user_id
+        assert store.get("s0") is None
+    finally:
+        store.close()
+
+
+def test_shared_memory_sweep_clears_tombstones(tmp_path, clock,
+                                               monkeypatch):
+    """ The sweeper empties expired sessions and the tombstones of older
+    tables, keeping the sessions behind them reachable
+    """
+    clock.now = 1000.0
+    monkeypatch.setattr(session_store, "time", clock)
+    store = SharedMemoryStore(str(tmp_path / "sessions"), ttl=10,
+                              sweep_interval=0, slots=16)
+    try:
+        for i in range(12):
+            store.put("s{}".format(i), "u{}".format(i))
+        for i in range(0, 12, 3):
+            store._data[store.offset(store.slot_of(
+                "s{}".format(i).encode()))] = SharedMemoryStore.DELETED
+        clock.now += 5
+        store.put("late", "u")
+        clock.now += 6
+        assert store.sweep(16) + store.sweep(16) == 8
+        states = [store._data[store.offset(i)] for i in range(store.slots)]
+        assert states.count(SharedMemoryStore.USED) == 1
+        assert SharedMemoryStore.DELETED not in states
+        assert store.get("late") == "u"
+    finally:
+        store.close()
+
+
+def test_incomplete_backend_fails_on_creation():
+    """ A backend missing a method of the interface cannot be created
+    """
+    class PartialStore(SessionStore):
+        """ Store without sweep() nor active()
+        """
+
+        def put(self, session_id: str, user_id: str):
+            """ Store nothing
+            """
+
+        def get(self, session_id: str):
+            """ Find nothing
+            """
+
+        def delete(self, session_id: str) -> bool:
+            """ Delete nothing
+            """
+            return False
+
+    with pytest.raises(TypeError):
+        PartialStore()
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+""" Tests of the Users views
+"""
+
+
+def test_projected_users_are_compact_and_sorted(client, make_user, basic):
+    """ Users with a fields projection are encoded like every other
+    response: compact, with sorted keys
+    """
+    make_user("bob@hbtn.io")
+    headers = {"Authorization": basic("bob@hbtn.io", "pwd")}
+    full = client.get("/api/v1/users", headers=headers).data
+    projected = client.get("/api/v1/users?fields=last_name,email",
+                           headers=headers).data
+    assert projected == b'[{"email":"bob@hbtn.io","last_name":null}]\n'
+    assert b'", "' not in full and full.startswith(b'[{"created_at":')